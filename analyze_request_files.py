@@ -1,42 +1,61 @@
 import openai
+import argparse
 import json
-from extract_files_descriptions import scan_project
+import logging
+from extract_files_descriptions import update_project_definitions
+from prompt_builder import PromptBuilder
+from symbol_index import load_symbol_index
+from response_cache import DEFAULT_TTL, cached_response, configure_response_cache, print_response_cache_stats
 import pyperclip
 import os
 from anthropic_helper import AnthropicHelper
 antropic_helper = AnthropicHelper(os.environ.get("ANTHROPIC_API_KEY"))
 
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_PROMPT_TOKENS = 150000
+OPENAI_MODEL = "o1-preview-2024-09-12"
+# AnthropicHelper picks the model itself; its responses are cached under this name
+ANTHROPIC_HELPER_MODEL = "anthropic_helper"
+
 
 def send_request_to_antropic(prompt):
     """
     Send the prepared prompt to Antropic and return the response.
     """
-    try:
-        response = antropic_helper.inference(prompt)
-        response_text = response[0].text
+    def send():
+        try:
+            response = antropic_helper.inference(prompt)
+            return response[0].text
+        except Exception as e:
+            print(f"Error communicating with Antropic: {e}")
+            return None
+
+    response_text = cached_response(ANTHROPIC_HELPER_MODEL, prompt, send, extract_json)
+    if response_text is not None:
         print(f"Response from Antropic: {response_text}")
-        return response_text
-    except Exception as e:
-        print(f"Error communicating with Antropic: {e}")
-        return None
+    return response_text
     
+def extract_json(response_content):
+    """Return the JSON object in a model response. Raises ValueError if there is none or it is malformed."""
+    if response_content.startswith("```json"):
+        response_content = response_content.strip("```json").strip()
+    elif response_content.startswith("```"):
+        response_content = response_content.strip("```")
+
+    json_start = response_content.find("{")
+    json_end = response_content.rfind("}") + 1
+
+    if json_start == -1 or json_end == 0:
+        raise ValueError("No JSON block found in the response.")
+
+    return json.loads(response_content[json_start:json_end])
+
 def parse_model_response(response_content):
     """Parse the JSON response from the model."""
     try:
         print("Parsing the model's response...")
-        if response_content.startswith("```json"):
-            response_content = response_content.strip("```json").strip()
-        elif response_content.startswith("```"):
-            response_content = response_content.strip("```")
-        
-        json_start = response_content.find("{")
-        json_end = response_content.rfind("}") + 1
-
-        if json_start == -1 or json_end == -1:
-            raise ValueError("No JSON block found in the response.")
-
-        json_string = response_content[json_start:json_end]
-        result = json.loads(json_string)
+        result = extract_json(response_content)
 
         print(f"Parsed response successfully. Result: {result}")
         return result
@@ -46,28 +65,33 @@ def parse_model_response(response_content):
         return {"files_to_check": []}
     
 
-def collect_project_data(directory):
+def collect_project_data(directory, use_cache=True):
     """
     Collect all files, methods, and classes from the project directory.
+
+    Uses the incremental definitions index, so only files changed since the last request are re-parsed.
     """
-    print(f"Scanning project directory: {directory}")
-    project_definitions = scan_project(directory)
+    project_definitions = update_project_definitions(directory, use_cache=use_cache)
     return project_definitions
 
-def prepare_llm_request(project_definitions, user_request):
+def format_definitions_summary(definitions):
+    """
+    Summarize a file's definitions by name only, for files whose full listing does not fit the prompt.
+    """
+    names = ", ".join(definition.get('name', definition.get('type', '')) for definition in definitions)
+    return f" - {len(definitions)} definitions: {names}\n"
+
+def prepare_llm_request(project_definitions, user_request, max_bytes=None, max_tokens=None):
     """
     Prepare the content to send to OpenAI.
+
+    Files whose definitions do not fit the byte/token budget are listed by definition name only.
     """
-    files_data = []
-    prompt = "Here are the files and definitions in your project:\n"
-    for file_path, definitions in project_definitions.items():
-        prompt += f"File: {file_path}\n"
-        for definition in definitions:
-            print(f"{file_path} definition 1: {definition} {list(definition.keys())} | {definition.get('description')} |  {definition.get('description') is not None}")  
-            prompt += f" - {definition.get('name', '')} {definition.get('type', '')} - {definition.get('description', '')}\n"
-    prompt += f"User Request: {user_request}\n"
-    prompt += "suggest which files should be changed according to the user request and project files. return the file name in the following json format:"
-    prompt += """
+    builder = PromptBuilder(max_bytes=max_bytes, max_tokens=max_tokens)
+    builder.set_footer(
+        f"User Request: {user_request}\n"
+        "suggest which files should be changed according to the user request and project files. return the file name in the following json format:"
+        """
     {
         "files_to_change": [
         {
@@ -83,43 +107,108 @@ def prepare_llm_request(project_definitions, user_request):
     ]
     }
     """
-    prompt += "write only the json object without any text before or after the json"
-    return prompt
+        "write only the json object without any text before or after the json"
+    )
+    builder.add("Here are the files and definitions in your project:\n")
+    for file_path, definitions in project_definitions.items():
+        header = f"File: {file_path}\n"
+        lines = []
+        for definition in definitions:
+            logger.debug("%s definition: %s", file_path, definition)
+            lines.append(f" - {definition.get('name', '')} {definition.get('type', '')} - {definition.get('description', '')}\n")
+        builder.add_file(header, "".join(lines), summary=format_definitions_summary(definitions))
+    return builder.build()
+
+def prepare_implementation_prompt(files_to_change, files_to_add, user_request, project_definitions, max_bytes=None, max_tokens=None):
+    """
+    Prepare the follow-up prompt with the content of the files to change.
+
+    File contents that do not fit the byte/token budget are replaced by their definitions, or truncated.
+    """
+    builder = PromptBuilder(max_bytes=max_bytes, max_tokens=max_tokens)
+    builder.set_footer(
+        f"I want to {user_request}.\n"
+        "implement the changes. write all the changed files and any new files needed to implement the requirement. write the entire content of the revised files."
+    )
+    definitions_by_path = {os.path.normpath(file_path): definitions for file_path, definitions in project_definitions.items()}
+
+    builder.add("here are the files that I think should be changed:\n")
+    for file in files_to_change:
+        with open(file['file'], 'r', encoding='utf-8') as f:
+            file_content = f.read()
+        definitions = definitions_by_path.get(os.path.normpath(file['file']))
+        summary = f"(content omitted to fit the prompt budget; definitions:)\n{format_definitions_summary(definitions)}" if definitions else None
+        builder.add_file(f"File: {file['file']}\nDescription: {file['description']}\n Content: ", file_content, summary=summary)
+
+    builder.add("here are the files that I think should be added:\n")
+    for file in files_to_add:
+        builder.add(f"File: {file['file']}\nDescription: {file['description']}\n")
+    return builder.build()
+
+def add_files_defining_symbols(files_to_change, user_request, symbol_index):
+    """
+    Add the files that define symbols named in the request, if the model did not already pick them.
+    """
+    selected = {os.path.normpath(file['file']) for file in files_to_change}
+    files_to_change = list(files_to_change)
+    for file_path, symbols in symbol_index.files_for_request(user_request).items():
+        if os.path.normpath(file_path) in selected:
+            continue
+        print(f"Adding {file_path}: defines {', '.join(symbols)}")
+        files_to_change.append({
+            "file": file_path,
+            "description": f"Defines {', '.join(symbols)}, named in the request.",
+        })
+    return files_to_change
 
 def send_request_to_openai(prompt): 
     """
     Send the prepared prompt to OpenAI and return the response.
     """
-    try:
-        """Send the first prompt to the model to get relevant files."""
-        print("Sending the first prompt to the model...")
-        client = openai.Client()
-        response = client.chat.completions.create(
-            model="o1-preview-2024-09-12",
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
-        )
-        message_content = response.choices[0].message.content
-        return message_content
-    except Exception as e:
-        print(f"Error communicating with OpenAI: {e}")
-        return None
+    def send():
+        try:
+            """Send the first prompt to the model to get relevant files."""
+            print("Sending the first prompt to the model...")
+            client = openai.Client()
+            response = client.chat.completions.create(
+                model=OPENAI_MODEL,
+                messages=[
+                    {"role": "user", "content": prompt}
+                ]
+            )
+            message_content = response.choices[0].message.content
+            return message_content
+        except Exception as e:
+            print(f"Error communicating with OpenAI: {e}")
+            return None
+
+    return cached_response(OPENAI_MODEL, prompt, send, extract_json)
 
 def main():
+    parser = argparse.ArgumentParser(description='Suggest which project files to change for a request.')
+    parser.add_argument('--no-cache', action='store_true', help='Read every file from disk, ignoring the file cache')
+    parser.add_argument('--max-prompt-bytes', type=int, help='Byte budget for each prompt (default: unlimited)')
+    parser.add_argument('--max-prompt-tokens', type=int, default=DEFAULT_MAX_PROMPT_TOKENS, help=f'Token budget for each prompt (default: {DEFAULT_MAX_PROMPT_TOKENS})')
+    parser.add_argument('--verbose', action='store_true', help='Log the per-definition debug output and the full prompts')
+    parser.add_argument('--no-response-cache', action='store_true', help='Send every prompt to the model, even if an identical one was answered before')
+    parser.add_argument('--response-cache-ttl', type=float, default=DEFAULT_TTL, help=f'Seconds a cached model response stays valid (default: {DEFAULT_TTL})')
+    args = parser.parse_args()
+    configure_response_cache(enabled=not args.no_response_cache, ttl=args.response_cache_ttl)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format="%(message)s")
+
     # Directory to scan
     project_directory = "."
 
     # Collect project data
-    project_definitions = collect_project_data(project_directory)
+    project_definitions = collect_project_data(project_directory, use_cache=not args.no_cache)
 
     # Get user request
     print("Enter your request for the project changes (e.g., 'Add login functionality'): ")
     user_request = input("> ")
 
     # Prepare the prompt for OpenAI
-    prompt = prepare_llm_request(project_definitions, user_request)
-    print(f"\nPrompt to send to OpenAI:\n{prompt}")
+    prompt = prepare_llm_request(project_definitions, user_request, args.max_prompt_bytes, args.max_prompt_tokens)
+    logger.debug("\nPrompt to send to OpenAI:\n%s", prompt)
     # Send the prompt to OpenAI
     print("Sending request to OpenAI...")
     response = send_request_to_antropic(prompt)
@@ -127,24 +216,15 @@ def main():
     
     files_to_change = parsed_res.get("files_to_change", [])
     files_to_add = parsed_res.get("files_to_add", [])
+    files_to_change = add_files_defining_symbols(files_to_change, user_request, load_symbol_index(project_definitions))
     
-    prompt = "here are the files that I think should be changed:\n"
-    for file in files_to_change:
-        # get file content
-        with open(file['file'], 'r') as f:
-            file_content = f.read()
-        prompt += f"File: {file['file']}\nDescription: {file['description']}\n Content: {file_content}\n"
-        
-    prompt += "here are the files that I think should be added:\n"
-    for file in files_to_add:
-        prompt += f"File: {file['file']}\nDescription: {file['description']}\n"
-    
-    prompt += f"I want to {user_request}.\n"
-    
-    prompt += "implement the changes. write all the changed files and any new files needed to implement the requirement. write the entire content of the revised files."
-    
-    print(prompt)
+    prompt = prepare_implementation_prompt(
+        files_to_change, files_to_add, user_request, project_definitions, args.max_prompt_bytes, args.max_prompt_tokens
+    )
+    logger.debug(prompt)
+    print(f"Implementation prompt copied to clipboard ({len(prompt)} characters).")
     pyperclip.copy(prompt)
+    print_response_cache_stats()
     
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,63 @@
+"""
+Scan-time scaling of extract_from_js on synthetic JavaScript files.
+
+Run from the repository root:
+
+    python -m benchmarks.extract_scaling
+    python -m benchmarks.extract_scaling --sizes 65536 262144 1048576 --repeat 5
+"""
+import time
+import argparse
+from extract_files_descriptions import extract_from_js
+
+
+SNIPPETS = [
+    "/**\n * Fetch scale measurements for {name}.\n */\nfunction {name}(scaleId) {{\n  return apiService.get(`/scales/${{scaleId}}`);\n}}\n\n",
+    "// Render the {name} panel\nconst {name} = (props) => {{\n  const [value, setValue] = useState(null);\n  return null;\n}};\n\n",
+    "class {name} extends React.Component {{\n  render() {{\n    return null;\n  }}\n}}\n\n",
+    "const {name}Config = {{\n  upper: 40,\n  lower: 8,\n  label: 'threshold',\n}};\n\n",
+    "export const {name} = function (items) {{\n  return items.filter(item => item.active);\n}};\n\n",
+]
+
+
+def generate_js(size):
+    """Generate synthetic JavaScript source of roughly `size` characters."""
+    parts = []
+    total = 0
+    index = 0
+    while total < size:
+        snippet = SNIPPETS[index % len(SNIPPETS)].format(name=f"item{index}")
+        parts.append(snippet)
+        total += len(snippet)
+        index += 1
+    return "".join(parts)
+
+
+def time_extraction(content, repeat):
+    """Return the best wall time of `repeat` runs of extract_from_js and the number of definitions found."""
+    best = None
+    definitions = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        definitions = extract_from_js(content, "synthetic.js")
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(definitions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure how extract_from_js scales with file size.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[65536, 131072, 262144, 524288, 1048576], help='Synthetic file sizes in characters')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per size; the best time is reported')
+    args = parser.parse_args()
+
+    print(f"{'size':>10} {'definitions':>12} {'time (ms)':>10} {'MB/s':>8}")
+    for size in args.sizes:
+        content = generate_js(size)
+        elapsed, definition_count = time_extraction(content, args.repeat)
+        throughput = len(content) / elapsed / 1e6 if elapsed else float("inf")
+        print(f"{len(content):>10} {definition_count:>12} {elapsed * 1000:>10.1f} {throughput:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Synthetic projects and transform inputs for the benchmarks.
+"""
+import os
+import json
+import random
+from benchmarks.extract_scaling import generate_js
+
+
+def generate_css(size):
+    """Generate a stylesheet of roughly `size` characters."""
+    rules = []
+    total = 0
+    while total < size:
+        rule = f".scale-card-{len(rules)} {{\n  color: #{len(rules) % 0xffffff:06x};\n  padding: {len(rules) % 16}px;\n}}\n\n"
+        rules.append(rule)
+        total += len(rule)
+    return "".join(rules)
+
+
+def generate_json(size):
+    """Generate a JSON document of roughly `size` characters."""
+    items = []
+    total = 2
+    while total < size:
+        item = {"id": f"scale_{len(items)}", "threshold": len(items) % 40, "label": f"Scale {len(items)}"}
+        items.append(item)
+        total += len(json.dumps(item)) + 2
+    return json.dumps(items, indent=1)
+
+
+def generate_minified_js(size):
+    """Generate a single-line, minified-looking bundle of roughly `size` characters."""
+    parts = []
+    total = 0
+    while total < size:
+        i = len(parts)
+        part = f"function a{i}(b){{return b+{i}}}var c{i}=function(d){{return d*2}};const e{i}=(f)=>f.map(g=>g+{i});"
+        parts.append(part)
+        total += len(part)
+    return "".join(parts)
+
+
+def generate_project(root, file_count=200, file_size=4096, depth=3, minified_files=0, minified_size=1048576, seed=0):
+    """
+    Write a synthetic React-like project under `root` and return its total size in bytes.
+
+    Files are spread over a tree `depth` directories deep, mostly .js/.jsx with some
+    .css and .json, and each JS file imports the previous one so the import graph
+    is connected. `minified_files` single-line bundles of `minified_size` are added
+    under build-like names that are still collected.
+    """
+    rng = random.Random(seed)
+    total_size = 0
+    previous_js = None
+    for index in range(file_count):
+        directory = os.path.join(root, *(f"level{level}_{rng.randrange(4)}" for level in range(rng.randrange(depth + 1))))
+        os.makedirs(directory, exist_ok=True)
+        kind = index % 10
+        if kind < 7:
+            name = f"module{index}.{'jsx' if kind % 2 else 'js'}"
+            content = generate_js(file_size)
+            if previous_js:
+                specifier = os.path.relpath(previous_js, directory).replace(os.sep, "/")
+                if not specifier.startswith("."):
+                    specifier = f"./{specifier}"
+                content = f"import {{ item0 }} from '{os.path.splitext(specifier)[0]}';\n{content}"
+            previous_js = os.path.join(directory, name)
+        elif kind < 9:
+            name = f"styles{index}.css"
+            content = generate_css(file_size)
+        else:
+            name = f"data{index}.json"
+            content = generate_json(file_size)
+        with open(os.path.join(directory, name), "w", encoding="utf-8") as f:
+            f.write(content)
+        total_size += len(content)
+
+    for index in range(minified_files):
+        content = generate_minified_js(minified_size)
+        with open(os.path.join(root, f"bundle{index}.min.js"), "w", encoding="utf-8") as f:
+            f.write(content)
+        total_size += len(content)
+    return total_size
+
+
+def generate_transform_pair(directory, functions=400, kept_ratio=0.8, allman_ratio=0.25, seed=0):
+    """
+    Write a source file, a target file that keeps most functions behind
+    "// this function should remain the same" markers, as the transform engine expects,
+    and the output the transform should produce. Returns the three paths.
+
+    A share of the functions put their opening brace on its own line, and the changed
+    ones carry an ordinary comment that must not be taken for a marker.
+    """
+    rng = random.Random(seed)
+    source_lines = []
+    target_lines = []
+    expected_lines = []
+    for index in range(functions):
+        header = [f"function handler{index}(event)\n", "{\n"] if rng.random() < allman_ratio else [f"function handler{index}(event) {{\n"]
+        body = [f"  const value{line} = event.value * {line};\n" for line in range(rng.randrange(3, 12))]
+        body += ["  return event;\n", "}\n", "\n"]
+        source_lines += header + body
+        if rng.random() < kept_ratio:
+            target_lines += header + ["  // this function should remain the same\n", "}\n", "\n"]
+            expected_lines += header + body
+        else:
+            changed = header + ["  // The event remains pending until it is handled\n", "  return { ...event, handled: true };\n", "}\n", "\n"]
+            target_lines += changed
+            expected_lines += changed
+
+    paths = []
+    for name, lines in (("source.txt", source_lines), ("target.txt", target_lines), ("expected.txt", expected_lines)):
+        path = os.path.join(directory, name)
+        with open(path, "w") as f:
+            f.writelines(lines)
+        paths.append(path)
+    return tuple(paths)
@@ -0,0 +1,71 @@
+"""
+Throughput of the single-pass JS definition scanner against the previous three-pass regexes.
+
+Run from the repository root:
+
+    python -m benchmarks.js_definitions
+    python -m benchmarks.js_definitions --directory src --repeat 10
+"""
+import re
+import time
+import argparse
+from extract_files_descriptions import LineIndex, extract_description, extract_from_js
+from file_collector import collect_all_file_contents
+
+
+def three_pass_extract_from_js(content, file_path):
+    """The previous extractor: separate finditer passes for functions, classes and arrow functions."""
+    definitions = []
+    line_index = LineIndex(content)
+    passes = [
+        (r'(.*function\s+(\w+)|(\w+)\s*=\s*(function|[(]))', "Function", lambda match: match.group(2) or match.group(3)),
+        (r'.*class\s+(\w+)', "Class", lambda match: match.group(1)),
+        (r'\b(const|let|var)\s+(\w+)\s*=\s*\([^)]*\)\s*=>', "Arrow Function", lambda match: match.group(2)),
+    ]
+    for pattern, definition_type, get_name in passes:
+        for match in re.finditer(pattern, content):
+            name = get_name(match)
+            if name:
+                definitions.append({
+                    "name": name,
+                    "type": definition_type,
+                    "description": extract_description(content, match.start(), line_index),
+                    "line_number": line_index.line_number(match.start()),
+                })
+    return definitions
+
+
+def time_extractor(extractor, files, repeat):
+    """Return the best wall time of `repeat` runs of an extractor over all files, and its definition count."""
+    best = None
+    definition_count = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        definition_count = sum(len(extractor(content, file_path)) for file_path, content in files)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, definition_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare JS definition extractors on a real source tree.')
+    parser.add_argument('--directory', default='src', help='Source tree to scan (default: src)')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per extractor; the best time is reported')
+    args = parser.parse_args()
+
+    files = [
+        (file_path, content)
+        for file_path, content in collect_all_file_contents(args.directory).items()
+        if file_path.endswith((".js", ".jsx"))
+    ]
+    total_size = sum(len(content) for _, content in files)
+    print(f"{len(files)} JS/JSX files, {total_size / 1e6:.2f} MB")
+
+    print(f"{'extractor':>12} {'definitions':>12} {'time (ms)':>10} {'MB/s':>8}")
+    for name, extractor in [("three-pass", three_pass_extract_from_js), ("single-pass", extract_from_js)]:
+        elapsed, definition_count = time_extractor(extractor, files, args.repeat)
+        print(f"{name:>12} {definition_count:>12} {elapsed * 1000:>10.1f} {total_size / elapsed / 1e6:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
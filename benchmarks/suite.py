@@ -0,0 +1,229 @@
+"""
+Benchmark suite for the scanning, analysis and transform pipeline.
+
+Every stage runs offline on a generated project: model calls are replaced by a
+stub and the response cache is bypassed. Results are written as JSON and can be
+compared with a baseline from another commit.
+
+Run from the repository root:
+
+    python -m benchmarks.suite --output before.json
+    python -m benchmarks.suite --baseline before.json --threshold 0.25
+    python -m benchmarks.suite --files 1000 --file-size 8192 --depth 6 --minified 2 --only collect_cold scan_project
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import contextlib
+from types import SimpleNamespace
+
+import files_analyzer
+from benchmarks.extract_scaling import generate_js
+from benchmarks.generators import generate_project, generate_transform_pair
+from extract_files_descriptions import extract_from_js, scan_project
+from file_collector import collect_all_file_contents
+from import_graph import ImportGraph
+from project_snapshot import ProjectSnapshot
+from response_cache import configure_response_cache
+from scripts.modify_files import CodeTransformer
+from search_index import SearchIndex
+
+
+RESULTS_VERSION = 1
+DEFAULT_THRESHOLD = 0.25
+# Differences below this are treated as noise, whatever the ratio
+MIN_REGRESSION_MS = 2.0
+USER_REQUEST = "Show a warning on the scale card when the threshold is exceeded"
+PROJECT_DIRECTORY = "project"
+
+
+def stub_chat_completion(prompt, *args, **kwargs):
+    """Stand-in for files_analyzer.create_chat_completion: picks the first file of the prompt."""
+    first_file = next((line[len("File: "):] for line in prompt.splitlines() if line.startswith("File: ")), None)
+    files_to_change = [{"file_path": first_file, "reason": "stub"}] if first_file else []
+    content = json.dumps({"files_to_check": [], "files_to_change": files_to_change})
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def measure(function, repeat):
+    """Run a function `repeat` times and return its best and median wall time in milliseconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - start) * 1000)
+    return {"best_ms": round(min(times), 3), "median_ms": round(statistics.median(times), 3), "runs": len(times)}
+
+
+def build_benchmarks(args):
+    """Return `{name: function}` for every stage, with their inputs prepared up front."""
+    contents = collect_all_file_contents(PROJECT_DIRECTORY, use_cache=False)
+    source_path, target_path, _ = generate_transform_pair(".", functions=args.transform_functions)
+    transformer = CodeTransformer(source_path, target_path, verbose=False)
+    operations_json = json.dumps({"operations": transformer.generate_local_operations()})
+    large_file = generate_js(args.large_file_size)
+    edited_file = next(file_path for file_path in contents if file_path.endswith(".js"))
+
+    def analyze():
+        with ProjectSnapshot(PROJECT_DIRECTORY, use_cache=False) as snapshot:
+            files_analyzer.analyze_files_and_requests(USER_REQUEST, "", snapshot, max_workers=1)
+
+    def analyze_cached():
+        # Touch one file so every run re-indexes and re-parses something with the caches on
+        with open(edited_file, "a") as f:
+            f.write("// edited\n")
+        with ProjectSnapshot(PROJECT_DIRECTORY, use_cache=True) as snapshot:
+            files_analyzer.analyze_files_and_requests(USER_REQUEST, "", snapshot, max_workers=1)
+
+    def search():
+        with ProjectSnapshot(PROJECT_DIRECTORY, use_cache=False) as snapshot:
+            index = SearchIndex()
+            index.update(snapshot)
+            index.search(USER_REQUEST)
+
+    def import_graph():
+        with ProjectSnapshot(PROJECT_DIRECTORY, use_cache=False) as snapshot:
+            ImportGraph.build(snapshot, use_cache=False)
+
+    return {
+        "collect_cold": lambda: collect_all_file_contents(PROJECT_DIRECTORY, use_cache=False),
+        "collect_warm": lambda: collect_all_file_contents(PROJECT_DIRECTORY, use_cache=True),
+        "scan_project": lambda: scan_project(PROJECT_DIRECTORY, use_cache=True),
+        "extract_large_file": lambda: extract_from_js(large_file, "large.js"),
+        "prepare_batched_prompts": lambda: files_analyzer.prepare_batched_prompts(USER_REQUEST, "", contents),
+        "search_index_build": search,
+        "import_graph_build": import_graph,
+        "analyze_stubbed": analyze,
+        "analyze_cached": analyze_cached,
+        "plan_operations": transformer.generate_local_operations,
+        "execute_operations": lambda: transformer.execute_operations(operations_json),
+    }
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(args):
+    """Generate the project in a scratch directory, run the selected benchmarks and return the results."""
+    config = {
+        "files": args.files,
+        "file_size": args.file_size,
+        "depth": args.depth,
+        "minified": args.minified,
+        "minified_size": args.minified_size,
+        "large_file_size": args.large_file_size,
+        "transform_functions": args.transform_functions,
+        "repeat": args.repeat,
+    }
+    results = {
+        "version": RESULTS_VERSION,
+        "commit": current_commit(),
+        "python": platform.python_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": config,
+        "benchmarks": {},
+    }
+
+    original_directory = os.getcwd()
+    original_completion = files_analyzer.create_chat_completion
+    workspace = tempfile.mkdtemp(prefix="scalez-bench-")
+    try:
+        # The file and response caches live in the working directory, so keep them in the scratch space
+        os.chdir(workspace)
+        files_analyzer.create_chat_completion = stub_chat_completion
+        configure_response_cache(enabled=False)
+        project_size = generate_project(
+            PROJECT_DIRECTORY, args.files, args.file_size, args.depth, args.minified, args.minified_size
+        )
+        results["project_bytes"] = project_size
+        print(f"Generated {args.files} files + {args.minified} minified bundles, {project_size / 1e6:.2f} MB")
+
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            benchmarks = build_benchmarks(args)
+            # Prime the file cache for the warm runs
+            collect_all_file_contents(PROJECT_DIRECTORY, use_cache=True)
+        for name, function in benchmarks.items():
+            if args.only and name not in args.only:
+                continue
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                results["benchmarks"][name] = measure(function, args.repeat)
+            print(f"{name:<26} {results['benchmarks'][name]['median_ms']:>10.1f} ms")
+    finally:
+        files_analyzer.create_chat_completion = original_completion
+        configure_response_cache(enabled=True)
+        os.chdir(original_directory)
+        shutil.rmtree(workspace, ignore_errors=True)
+    return results
+
+
+def compare_results(results, baseline, threshold=DEFAULT_THRESHOLD, min_regression_ms=MIN_REGRESSION_MS):
+    """
+    Print each benchmark's median against the baseline and return the names of the regressions:
+    slower by more than `threshold` (a fraction) and by more than `min_regression_ms`.
+    """
+    if baseline.get("config") != results["config"]:
+        print("Warning: the baseline was run with a different configuration.")
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'}:")
+    print(f"{'benchmark':<26} {'baseline':>10} {'current':>10} {'change':>8}")
+    regressions = []
+    for name, result in results["benchmarks"].items():
+        previous = baseline.get("benchmarks", {}).get(name)
+        if previous is None:
+            print(f"{name:<26} {'-':>10} {result['median_ms']:>10.1f} {'new':>8}")
+            continue
+        change = result["median_ms"] / previous["median_ms"] - 1 if previous["median_ms"] else 0.0
+        regressed = change > threshold and result["median_ms"] - previous["median_ms"] > min_regression_ms
+        marker = "  REGRESSION" if regressed else ""
+        print(f"{name:<26} {previous['median_ms']:>10.1f} {result['median_ms']:>10.1f} {change:>+8.0%}{marker}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the scanning, analysis and transform pipeline offline.')
+    parser.add_argument('--files', type=int, default=300, help='Files in the synthetic project (default: 300)')
+    parser.add_argument('--file-size', type=int, default=4096, help='Approximate size of each file in characters (default: 4096)')
+    parser.add_argument('--depth', type=int, default=4, help='Maximum directory depth of the project tree (default: 4)')
+    parser.add_argument('--minified', type=int, default=1, help='Large single-line bundles added to the project (default: 1)')
+    parser.add_argument('--minified-size', type=int, default=1048576, help='Size of each bundle in characters (default: 1 MB)')
+    parser.add_argument('--large-file-size', type=int, default=1048576, help='Size of the file for extract_large_file (default: 1 MB)')
+    parser.add_argument('--transform-functions', type=int, default=400, help='Functions in the synthetic transform source (default: 400)')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per benchmark; the median is compared (default: 5)')
+    parser.add_argument('--only', nargs='+', help='Run only these benchmarks')
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    parser.add_argument('--baseline', help='Results JSON of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help=f'Allowed slowdown before a benchmark counts as a regression (default: {DEFAULT_THRESHOLD})')
+    args = parser.parse_args()
+
+    results = run_suite(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+        print("\nNo regressions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,83 @@
 import re
+import argparse
+from bisect import bisect_right
+from itertools import accumulate, chain
+import math
+import os
+import hashlib
+import stat
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from file_cache import CACHE_DIRECTORY
 from file_collector import collect_all_file_contents
 import json
 
 
-def extract_description(content, match_start):
+DEFINITIONS_FILE = "project_definitions.json"
+# Bump when extraction output changes, so incremental scans re-extract every file
+EXTRACTOR_VERSION = 2
+
+# Every JS definition kind in one alternation, so a file is scanned in a single pass.
+# Leading `export`/`export default`/`async` modifiers are part of the match, so the
+# description lookup starts on the line above the definition.
+JS_DEFINITION_PATTERN = re.compile(r"""
+    (?:\bexport\s+(?P<export_default>default\s+)?)?
+    (?:\basync\s+)?
+    (?:
+        \bclass\s+(?P<class_name>\w+)
+      | \b(?:const|let|var)\s+(?P<arrow_name>\w+)\s*=\s*(?:async\s+)?(?:\([^)]*\)|\w+)\s*=>
+      | \b(?P<function_keyword>function)\b\s*\*?\s*(?P<function_name>\w+)?
+      | \b(?P<assigned_name>\w+)\s*=\s*(?:async\s+)?(?:function\b|\()
+    )
+""", re.VERBOSE)
+
+# Chunks submitted per worker process, so uneven files still balance across workers
+CHUNKS_PER_JOB = 4
+
+
+class LineIndex:
+    """
+    Offsets of the line starts in a file's content.
+
+    Built once per file so that mapping a position to its line number is a bisect
+    instead of counting the newlines of the whole prefix.
+    """
+
+    def __init__(self, content):
+        self.content = content
+        self.line_starts = [0] + list(accumulate(len(line) + 1 for line in content.split("\n")[:-1]))
+
+    def line_number(self, position):
+        """Return the 1-based line number of a position in the content."""
+        return bisect_right(self.line_starts, position)
+
+    def line(self, line_number):
+        """Return the text of a 1-based line number, without its newline."""
+        start = self.line_starts[line_number - 1]
+        if line_number < len(self.line_starts):
+            return self.content[start:self.line_starts[line_number] - 1]
+        return self.content[start:]
+
+    def lines_before(self, position):
+        """Yield the text before `position` on its line, then each full line above it, nearest first."""
+        line_number = self.line_number(position)
+        return chain(
+            [self.content[self.line_starts[line_number - 1]:position]],
+            (self.line(number) for number in range(line_number - 1, 0, -1)),
+        )
+
+
+def extract_description(content, match_start, line_index=None):
     """
     Extract the comment immediately preceding a function or class declaration.
     """
-    lines = content[:match_start].split("\n")
+    if line_index is None:
+        line_index = LineIndex(content)
     description = []
     in_comment_block = False
 
     # Traverse lines in reverse to find the closest preceding comment
-    for line in reversed(lines):
+    for line in line_index.lines_before(match_start):
         stripped = line.strip()
         if stripped.startswith("*/"):  # End of a JSDoc block
             in_comment_block = True
@@ -34,43 +99,33 @@ def extract_description(content, match_start):
 def extract_from_js(content, file_path):
     """
     Extract functions, classes, and their descriptions from JavaScript or JSX content.
+
+    All definition kinds are found in a single left-to-right pass of JS_DEFINITION_PATTERN.
     """
     definitions = []
+    line_index = LineIndex(content)
 
     try:
-        function_matches = re.finditer(r'(.*function\s+(\w+)|(\w+)\s*=\s*(function|[(]))', content)
-        class_matches = re.finditer(r'.*class\s+(\w+)', content)
-        arrow_function_matches = re.finditer(r'\b(const|let|var)\s+(\w+)\s*=\s*\([^)]*\)\s*=>', content)
-
-        for match in function_matches:
-            func_name = match.group(2) or match.group(3)
-            if func_name:
-                description = extract_description(content, match.start())
-                definitions.append({
-                    "name": func_name,
-                    "type": "Function",
-                    "description": description,
-                    "line_number": content[:match.start()].count("\n") + 1,
-                })
-
-        for match in class_matches:
-            cls_name = match.group(1)
-            description = extract_description(content, match.start())
-            definitions.append({
-                "name": cls_name,
-                "type": "Class",
-                "description": description,
-                "line_number": content[:match.start()].count("\n") + 1,
-            })
+        for match in JS_DEFINITION_PATTERN.finditer(content):
+            if match.group("class_name"):
+                name, definition_type = match.group("class_name"), "Class"
+            elif match.group("arrow_name"):
+                name, definition_type = match.group("arrow_name"), "Arrow Function"
+            elif match.group("function_keyword"):
+                name = match.group("function_name")
+                if not name and match.group("export_default"):
+                    name = "default"
+                definition_type = "Function"
+            else:
+                name, definition_type = match.group("assigned_name"), "Function"
+            if not name:
+                continue
 
-        for match in arrow_function_matches:
-            var_name = match.group(2)
-            description = extract_description(content, match.start())
             definitions.append({
-                "name": var_name,
-                "type": "Arrow Function",
-                "description": description,
-                "line_number": content[:match.start()].count("\n") + 1,
+                "name": name,
+                "type": definition_type,
+                "description": extract_description(content, match.start(), line_index),
+                "line_number": line_index.line_number(match.start()),
             })
 
     except Exception as e:
@@ -124,43 +179,197 @@ def extract_from_json(content):
     return definitions
 
 
-def scan_project(directory):
+def extract_file_definitions(file_path, content):
     """
-    Scan all files in the project and extract function/class definitions with descriptions.
+    Extract the definitions recorded for a single file, or None if nothing is recorded for it.
     """
-    print(f"Scanning project directory: {directory}")
-    files_content = collect_all_file_contents(directory)
-    project_definitions = {}
+    if file_path.endswith((".js", ".jsx")):
+        return extract_from_js(content, file_path) or None
+    elif file_path.endswith(".css"):
+        return [{"type": "CSS"}] if extract_from_css(content) else None
+    elif file_path.endswith(".json"):
+        return [{"type": "JSON"}]
+    return None
+
 
-    for file_path, content in files_content.items():
+def extract_chunk_definitions(chunk):
+    """
+    Extract the definitions of a chunk of (file_path, content) pairs in a worker process.
+    """
+    return [(file_path, extract_file_definitions(file_path, content)) for file_path, content in chunk]
+
+
+def extract_definitions_in_parallel(files, jobs):
+    """
+    Spread per-file extraction of (file_path, content) pairs across `jobs` processes.
+
+    Files are submitted in chunks to amortize inter-process overhead, and results are
+    returned in the same order as `files`.
+    """
+    chunk_size = max(1, math.ceil(len(files) / (jobs * CHUNKS_PER_JOB)))
+    chunks = [files[i:i + chunk_size] for i in range(0, len(files), chunk_size)]
+    print(f"Analyzing {len(files)} files in {len(chunks)} chunks with {jobs} processes...")
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return [result for chunk_results in executor.map(extract_chunk_definitions, chunks) for result in chunk_results]
+
+
+def extract_definitions(files, jobs=1):
+    """
+    Extract the definitions of (file_path, content) pairs, serially or across `jobs` processes.
+
+    Returns (file_path, definitions) pairs in the same order as `files`.
+    """
+    if jobs > 1 and len(files) > 1:
+        return extract_definitions_in_parallel(files, jobs)
+
+    results = []
+    for file_path, content in files:
         if file_path.endswith((".js", ".jsx")):
             print(f"Analyzing JS/JSX file: {file_path}")
-            definitions = extract_from_js(content, file_path)
-            if definitions:
-                project_definitions[file_path] = definitions
         elif file_path.endswith(".css"):
             print(f"Analyzing CSS file: {file_path}")
-            definitions = extract_from_css(content)
-            if definitions:
-                project_definitions[file_path] = [{"type": "CSS"}]
-        elif file_path.endswith(".json"):
-            project_definitions[file_path] = [{"type": "JSON"}]
+        results.append((file_path, extract_file_definitions(file_path, content)))
+    return results
+
 
+def scan_project(directory, use_cache=True, jobs=1):
+    """
+    Scan all files in the project and extract function/class definitions with descriptions.
+
+    With `jobs` > 1 the files are parsed in a process pool; the result is identical to a serial scan.
+    """
+    print(f"Scanning project directory: {directory}")
+    files_content = collect_all_file_contents(directory, use_cache=use_cache)
+    results = extract_definitions(list(files_content.items()), jobs)
+    return {file_path: definitions for file_path, definitions in results if definitions}
+
+
+def file_fingerprint(content):
+    """
+    Hash a file's content to detect changes between incremental scans.
+    """
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def fingerprints_file_for(output_file):
+    """
+    Path of the per-file fingerprints kept for a definitions file, inside the cache directory.
+    """
+    name = os.path.splitext(os.path.basename(output_file))[0]
+    return os.path.join(CACHE_DIRECTORY, f"{name}.fingerprints.json")
+
+
+def load_previous_definitions(output_file):
+    """
+    Load the definitions and per-file fingerprints of a previous scan.
+
+    Returns empty mappings if either file is missing or unreadable, or if it was
+    written by a different extractor version.
+    """
+    try:
+        with open(output_file, "r", encoding="utf-8") as f:
+            definitions = json.load(f)
+        with open(fingerprints_file_for(output_file), "r", encoding="utf-8") as f:
+            fingerprints = json.load(f)
+    except (OSError, ValueError):
+        return {}, {}
+    if fingerprints.get("extractor_version") != EXTRACTOR_VERSION:
+        return {}, {}
+    return definitions, fingerprints.get("files", {})
+
+
+def update_project_definitions(directory, output_file=DEFINITIONS_FILE, use_cache=True, jobs=1, full=False):
+    """
+    Bring the definitions file up to date with the project and return the definitions.
+
+    Only files whose content hash changed since the previous scan are re-extracted,
+    entries for deleted files are dropped, and unchanged files reuse their previous
+    definitions. With `full`, every file is re-extracted.
+    """
+    print(f"Scanning project directory: {directory}")
+    files_content = collect_all_file_contents(directory, use_cache=use_cache)
+    # Never index our own output
+    output_path = os.path.abspath(output_file)
+    files_content = {
+        file_path: content for file_path, content in files_content.items()
+        if os.path.abspath(file_path) != output_path
+    }
+    previous_definitions, previous_fingerprints = ({}, {}) if full else load_previous_definitions(output_file)
+
+    fingerprints = {file_path: file_fingerprint(content) for file_path, content in files_content.items()}
+    changed_files = [
+        (file_path, content) for file_path, content in files_content.items()
+        if previous_fingerprints.get(file_path) != fingerprints[file_path]
+    ]
+    deleted_files = [file_path for file_path in previous_fingerprints if file_path not in files_content]
+    print(f"{len(changed_files)} changed, {len(deleted_files)} deleted, "
+          f"{len(files_content) - len(changed_files)} unchanged files.")
+
+    extracted = dict(extract_definitions(changed_files, jobs))
+    project_definitions = {}
+    for file_path in files_content:
+        definitions = extracted[file_path] if file_path in extracted else previous_definitions.get(file_path)
+        if definitions:
+            project_definitions[file_path] = definitions
+
+    if changed_files or deleted_files or not os.path.exists(output_file):
+        # Definitions first: if the fingerprints write fails, the next run just re-extracts
+        save_results_to_file(project_definitions, output_file)
+        os.makedirs(CACHE_DIRECTORY, exist_ok=True)
+        write_json_atomically(
+            {"extractor_version": EXTRACTOR_VERSION, "files": fingerprints},
+            fingerprints_file_for(output_file),
+        )
     return project_definitions
 
 
-def save_results_to_file(results, output_file="project_definitions.json"):
+def write_json_atomically(data, output_file, indent=None):
     """
-    Save the extracted definitions to a JSON file.
+    Write JSON to a temporary file in the same directory, then rename it over `output_file`.
+
+    The file keeps the mode of the file it replaces, or gets the usual mode for a new
+    file (0666 less the umask) rather than the temporary file's 0600.
     """
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(results, f, indent=2)
+    directory = os.path.dirname(os.path.abspath(output_file))
+    try:
+        mode = stat.S_IMODE(os.stat(output_file).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = 0o666 & ~umask
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=directory, suffix=".tmp", delete=False) as f:
+        try:
+            json.dump(data, f, indent=indent)
+            f.flush()
+            os.chmod(f.name, mode)
+            os.fsync(f.fileno())
+        except BaseException:
+            f.close()
+            os.remove(f.name)
+            raise
+    os.replace(f.name, output_file)
+
+
+def save_results_to_file(results, output_file=DEFINITIONS_FILE):
+    """
+    Save the extracted definitions to a JSON file, atomically.
+    """
+    write_json_atomically(results, output_file, indent=2)
     print(f"Results saved to {output_file}")
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Extract function and class definitions from the project.')
+    parser.add_argument('--no-cache', action='store_true', help='Read every file from disk, ignoring the file cache')
+    parser.add_argument('--incremental', action='store_true', help=f'Re-extract only files changed since the last {DEFINITIONS_FILE}')
+    parser.add_argument('--jobs', type=int, default=1, help='Worker processes for parsing files; 0 uses every CPU (default: 1, serial)')
+    args = parser.parse_args()
+    jobs = args.jobs or os.cpu_count() or 1
+
     project_directory = "."
-    project_definitions = scan_project(project_directory)
+    project_definitions = update_project_definitions(
+        project_directory, use_cache=not args.no_cache, jobs=jobs, full=not args.incremental
+    )
 
     for file_path, definitions in project_definitions.items():
         print(f"\nFile: {file_path}")
@@ -170,6 +379,4 @@ if __name__ == "__main__":
             elif definition["type"] == "JSON Key":
                 print(f"  - {definition['type']} '{definition['name']}': Value [{definition['value']}]")
             else:
-                print(f"  - {definition['type']} : {definition.get('description', '')}")
-
-    save_results_to_file(project_definitions)
\ No newline at end of file
+                print(f"  - {definition['type']} : {definition.get('description', '')}")
\ No newline at end of file
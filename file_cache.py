@@ -0,0 +1,110 @@
+import os
+import sqlite3
+
+
+CACHE_DIRECTORY = ".scalez_cache"
+FILES_CACHE_NAME = "files.sqlite"
+# Entries written per transaction; between flushes no write lock is held on the database
+FLUSH_EVERY = 50
+
+
+class FileCache:
+    """
+    On-disk cache of collected file contents, keyed by path, mtime and size.
+
+    A cached entry is only served while the file's mtime and size are unchanged,
+    so edited files are always re-read from disk. New entries are buffered and
+    written in short transactions of up to `flush_every` entries, so a long-lived
+    cache (e.g. a snapshot's, open while waiting on the model) never keeps the
+    database locked for other processes.
+
+    The cache is best-effort: on a database error (e.g. the file is locked by
+    another process) it reports the error once and is bypassed from then on, so
+    files are read from disk instead of being skipped. On a local disk a hit costs
+    about as much as reading the file; what the cache saves is re-reading
+    unchanged files from slow or network filesystems.
+    """
+
+    def __init__(self, cache_directory=CACHE_DIRECTORY, flush_every=FLUSH_EVERY):
+        os.makedirs(cache_directory, exist_ok=True)
+        self.path = os.path.join(cache_directory, FILES_CACHE_NAME)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, content TEXT NOT NULL)"
+        )
+        self.connection.commit()
+        self.flush_every = flush_every
+        self.pending = {}
+        self.error = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, file_path, mtime_ns, size):
+        """Return the cached content for a file, or None if it is missing or stale."""
+        path = os.path.abspath(file_path)
+        pending = self.pending.get(path)
+        if pending is not None and pending[:2] == (mtime_ns, size):
+            self.hits += 1
+            return pending[2]
+        row = None
+        if self.error is None:
+            try:
+                row = self.connection.execute(
+                    "SELECT content FROM files WHERE path = ? AND mtime_ns = ? AND size = ?",
+                    (path, mtime_ns, size),
+                ).fetchone()
+            except sqlite3.Error as e:
+                self.disable(e)
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def disable(self, error):
+        """Stop using the database after an error, keeping the first error for reporting."""
+        if self.error is None:
+            print(f"File cache unavailable ({error}), reading files from disk.")
+            self.error = error
+        self.pending.clear()
+
+    def put(self, file_path, mtime_ns, size, content):
+        """Store the content read for a file at the given mtime and size."""
+        if self.error is not None:
+            return
+        self.pending[os.path.abspath(file_path)] = (mtime_ns, size, content)
+        if len(self.pending) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered entries in one transaction."""
+        if not self.pending or self.error is not None:
+            return
+        try:
+            with self.connection:
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO files (path, mtime_ns, size, content) VALUES (?, ?, ?, ?)",
+                    [(path, mtime_ns, size, content) for path, (mtime_ns, size, content) in self.pending.items()],
+                )
+        except sqlite3.Error as e:
+            self.disable(e)
+        self.pending.clear()
+
+    def close(self):
+        """Write pending entries and close the database."""
+        try:
+            self.flush()
+        finally:
+            self.connection.close()
+
+
+def open_file_cache(use_cache=True, cache_directory=CACHE_DIRECTORY):
+    """Open the file cache, or return None when caching is disabled or unavailable."""
+    if not use_cache:
+        return None
+    try:
+        return FileCache(cache_directory)
+    except (OSError, sqlite3.Error) as e:
+        print(f"File cache unavailable ({e}), reading files from disk.")
+        return None
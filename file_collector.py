@@ -1,70 +1,280 @@
 import os
+import sys
+import time
 import pyperclip
 import argparse
 import json
+from file_cache import CACHE_DIRECTORY, open_file_cache
 
 
-def get_file_contents(directory, file_extension, exclude_files=[], exclude_directories=[]):
-    files_content = {}
-    for root, dirs, files in os.walk(directory):
-        # Exclude specified directories
-        dirs[:] = [d for d in dirs if d not in ['__pycache__', '.serverless', 'venv', 'node_modules', '.venv', '.git']]
-        for directory in exclude_directories:
-            if directory in dirs:
-                dirs.remove(directory)
-        
-        for file in files:
-            if file in exclude_files:
+DEFAULT_EXTENSIONS = ('.js', '.jsx', '.css', '.json')
+DEFAULT_EXCLUDE_FILES = ['main.js', ".DS_Store"]
+DEFAULT_EXCLUDE_DIRECTORIES = ['node_modules', 'build']
+ALWAYS_EXCLUDED_DIRECTORIES = ['__pycache__', '.serverless', 'venv', 'node_modules', '.venv', '.git', CACHE_DIRECTORY]
+ALWAYS_INCLUDED_FILES = ['serverless.yml']
+OUTPUT_HEADER = "Here is my files' content:\n"
+TRUNCATION_NOTICE = "\n... [output truncated at {max_bytes} bytes]\n"
+CLIPBOARD = "clipboard"
+
+
+def new_scan_stats():
+    """Create an empty stats dictionary for a directory scan."""
+    return {"directories_visited": 0, "files_read": 0, "cache_hits": 0, "wall_time": 0.0}
+
+
+def read_file(file_path, cache=None, stat_result=None):
+    """Read a text file, serving it from the cache when its mtime and size are unchanged."""
+    if cache is None:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    if stat_result is None:
+        stat_result = os.stat(file_path)
+    content = cache.get(file_path, stat_result.st_mtime_ns, stat_result.st_size)
+    if content is None:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        cache.put(file_path, stat_result.st_mtime_ns, stat_result.st_size, content)
+    return content
+
+
+def list_files(directory, extensions, exclude_files=[], exclude_directories=[], stats=None):
+    """
+    Walk the directory tree once and return `{file_path: os.stat_result}` for matching files.
+
+    Files are grouped in the order of `extensions`, so the listing follows the same
+    order as calling `get_file_contents` once per extension and merging the results.
+    """
+    start_time = time.perf_counter()
+    if stats is None:
+        stats = new_scan_stats()
+    excluded_directories = set(ALWAYS_EXCLUDED_DIRECTORIES) | set(exclude_directories)
+    excluded_files = set(exclude_files)
+    buckets = {extension: {} for extension in extensions}
+    first_bucket = buckets[extensions[0]] if extensions else {}
+
+    pending = [directory]
+    while pending:
+        current = pending.pop()
+        stats["directories_visited"] += 1
+        subdirectories = []
+        try:
+            with os.scandir(current) as entries:
+                entries = list(entries)
+        except OSError as e:
+            print(f"Skipping directory ({e}): {current}")
+            continue
+
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name not in excluded_directories:
+                    subdirectories.append(entry.path)
+                continue
+            if entry.name in excluded_files or not entry.is_file():
                 continue
-        
-            if file.endswith(file_extension) or file == 'serverless.yml':
-                print(f"file_extension: {file_extension} file: {file}")
-                file_path = os.path.join(root, file)
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                        files_content[file_path] = content
-                except UnicodeDecodeError:
-                    print(f"Skipping file (encoding issue): {file_path}")
-                except Exception as e:
-                    print(f"Skipping file ({e}): {file_path}")
+
+            if entry.name in ALWAYS_INCLUDED_FILES:
+                bucket = first_bucket
+            else:
+                bucket = next((buckets[ext] for ext in extensions if entry.name.endswith(ext)), None)
+                if bucket is None:
+                    continue
+
+            file_path = os.path.join(current, entry.name)
+            try:
+                bucket[file_path] = entry.stat()
+            except OSError as e:
+                print(f"Skipping file ({e}): {file_path}")
+
+        # Visit subdirectories in listing order, like a top-down os.walk
+        pending.extend(reversed(subdirectories))
+
+    files = {}
+    for bucket in buckets.values():
+        files.update(bucket)
+    stats["wall_time"] += time.perf_counter() - start_time
+    return files
+
+
+def scan_files(directory, extensions, exclude_files=[], exclude_directories=[], stats=None, cache=None):
+    """
+    Walk the directory tree once and read every file matching one of the extensions.
+
+    When a `FileCache` is given, unchanged files are served from it instead of disk.
+    """
+    if stats is None:
+        stats = new_scan_stats()
+    files = list_files(directory, extensions, exclude_files, exclude_directories, stats)
+
+    start_time = time.perf_counter()
+    cache_hits_before = cache.hits if cache else 0
+    files_content = {}
+    for file_path, stat_result in files.items():
+        try:
+            files_content[file_path] = read_file(file_path, cache, stat_result)
+            stats["files_read"] += 1
+        except UnicodeDecodeError:
+            print(f"Skipping file (encoding issue): {file_path}")
+        except Exception as e:
+            print(f"Skipping file ({e}): {file_path}")
+
+    if cache:
+        cache_hits = cache.hits - cache_hits_before
+        stats["cache_hits"] += cache_hits
+        stats["files_read"] -= cache_hits
+    stats["wall_time"] += time.perf_counter() - start_time
     return files_content
 
 
-def print_file_contents(directory):
-    files_content = collect_all_file_contents(directory)
-    output = "Here is my files' content:\n"
-    for file_path, content in files_content.items():
-        output += f"<{file_path}>:\n"
-        output += "File Content:\n"
-        output += content
-        output += "\n"
-    return output
+def get_file_contents(directory, file_extension, exclude_files=[], exclude_directories=[]):
+    extensions = (file_extension,) if isinstance(file_extension, str) else tuple(file_extension)
+    return scan_files(directory, extensions, exclude_files=exclude_files, exclude_directories=exclude_directories)
+
+
+def iter_file_blocks(files_content, header=OUTPUT_HEADER):
+    """
+    Yield the output of `print_file_contents` piece by piece: the header, then one
+    block per file. `files_content` is an iterable of (file_path, content) pairs,
+    so only one file needs to be in memory at a time.
+    """
+    yield header
+    for file_path, content in files_content:
+        yield f"<{file_path}>:\nFile Content:\n{content}\n"
+
+
+def limit_output(chunks, max_bytes=None):
+    """Pass chunks through until the next one would exceed max_bytes, then end with a truncation notice."""
+    if max_bytes is None:
+        yield from chunks
+        return
+    size = 0
+    for chunk in chunks:
+        size += len(chunk.encode('utf-8'))
+        if size > max_bytes:
+            yield TRUNCATION_NOTICE.format(max_bytes=max_bytes)
+            return
+        yield chunk
+
+
+def write_output(chunks, destination=CLIPBOARD):
+    """
+    Write chunks to the clipboard, stdout ("-") or a file, and return the number of bytes written.
+
+    Stdout and files are written chunk by chunk. The clipboard only takes a whole
+    string, so chunks are joined once there; use a size cap to bound it.
+    """
+    if destination == CLIPBOARD:
+        output = "".join(chunks)
+        pyperclip.copy(output)
+        return len(output.encode('utf-8'))
+
+    size = 0
+    stream = sys.stdout if destination == "-" else open(destination, 'w', encoding='utf-8')
+    try:
+        for chunk in chunks:
+            stream.write(chunk)
+            size += len(chunk.encode('utf-8'))
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+    return size
+
 
+def iter_project_files_content(directory=".", stats=None, use_cache=True, files=None):
+    """Yield (file_path, content) for the project files, reading one file at a time."""
+    if stats is None:
+        stats = new_scan_stats()
+    if files is None:
+        files = list_project_files(directory, stats=stats)
+    cache = open_file_cache(use_cache)
+    try:
+        for file_path, stat_result in files.items():
+            start_time = time.perf_counter()
+            cache_hits_before = cache.hits if cache else 0
+            try:
+                content = read_file(file_path, cache, stat_result)
+            except UnicodeDecodeError:
+                print(f"Skipping file (encoding issue): {file_path}", file=sys.stderr)
+                continue
+            except Exception as e:
+                print(f"Skipping file ({e}): {file_path}", file=sys.stderr)
+                continue
+            finally:
+                stats["wall_time"] += time.perf_counter() - start_time
+            if cache and cache.hits > cache_hits_before:
+                stats["cache_hits"] += 1
+            else:
+                stats["files_read"] += 1
+            yield file_path, content
+    finally:
+        if cache:
+            cache.close()
+
+
+def print_file_contents(directory, files_content=None):
+    if files_content is None:
+        files_content = collect_all_file_contents(directory)
+    return "".join(iter_file_blocks(files_content.items()))
+
+
+def list_project_files(directory=".", stats=None):
+    """List the files `collect_all_file_contents` would read, without reading them."""
+    return list_files(
+        directory,
+        DEFAULT_EXTENSIONS,
+        exclude_files=DEFAULT_EXCLUDE_FILES,
+        exclude_directories=DEFAULT_EXCLUDE_DIRECTORIES,
+        stats=stats,
+    )
 
-def collect_all_file_contents(directory="."):
-    all_files_content = {}
-    all_files_content.update(get_file_contents(directory, '.js', exclude_files=['main.js', ".DS_Store"], exclude_directories=['node_modules', 'build']))
-    all_files_content.update(get_file_contents(directory, '.jsx', exclude_files=[], exclude_directories=['node_modules', 'build']))
-    all_files_content.update(get_file_contents(directory, '.css', exclude_files=['main.js', ".DS_Store"], exclude_directories=['node_modules', 'build']))
-    all_files_content.update(get_file_contents(directory, '.json', exclude_files=[], exclude_directories=['node_modules', 'build']))
-    return all_files_content
+
+def collect_all_file_contents(directory=".", stats=None, use_cache=True):
+    cache = open_file_cache(use_cache)
+    try:
+        return scan_files(
+            directory,
+            DEFAULT_EXTENSIONS,
+            exclude_files=DEFAULT_EXCLUDE_FILES,
+            exclude_directories=DEFAULT_EXCLUDE_DIRECTORIES,
+            stats=stats,
+            cache=cache,
+        )
+    finally:
+        if cache:
+            cache.close()
+
+
+def print_scan_stats(stats, file=None):
+    """Print the counters gathered during a directory scan."""
+    print("Scan stats:", file=file)
+    print(f"- Directories visited: {stats['directories_visited']}", file=file)
+    print(f"- Files read: {stats['files_read']}", file=file)
+    print(f"- Files served from cache: {stats['cache_hits']}", file=file)
+    print(f"- Wall time: {stats['wall_time'] * 1000:.1f} ms", file=file)
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Process project directory files.')
     parser.add_argument('project_directory', nargs='?', default='src', help='Project directory to search (default: src)')
+    parser.add_argument('--stats', action='store_true', help='Report directories visited, files read and wall time')
+    parser.add_argument('--no-cache', action='store_true', help='Read every file from disk, ignoring the file cache')
+    parser.add_argument('--output', default=CLIPBOARD, help='Where to write the contents: clipboard (default), - for stdout, or a file path')
+    parser.add_argument('--max-bytes', type=int, help='Stop writing file contents after this many bytes')
     args = parser.parse_args()
     project_directory = args.project_directory
-    file_contents = collect_all_file_contents(project_directory)
+    stats = new_scan_stats()
+    files = list_project_files(project_directory, stats=stats)
+    # Diagnostics go to stderr when the contents themselves are written to stdout
+    log = sys.stderr if args.output == "-" else sys.stdout
     # print file names
-    print("Files:")
-    for file in file_contents:
-        print(file)
-    
-    # Print contents as a formatted string
-    output = print_file_contents(project_directory)
-    # print(output)
-    
-    # Copy to clipboard
-    pyperclip.copy(output)
\ No newline at end of file
+    print("Files:", file=log)
+    for file in files:
+        print(file, file=log)
+
+    # Stream the contents as a formatted string, one file at a time
+    files_content = iter_project_files_content(project_directory, stats=stats, use_cache=not args.no_cache, files=files)
+    size = write_output(limit_output(iter_file_blocks(files_content), args.max_bytes), args.output)
+    print(f"Wrote {size} bytes to {args.output}", file=log)
+
+    if args.stats:
+        print_scan_stats(stats, file=log)
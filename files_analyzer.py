@@ -1,14 +1,58 @@
 import os
+import time
+import random
+import argparse
 import openai
 import json
 import pyperclip
-from file_collector import collect_all_file_contents
-
-client = openai.Client()
+from concurrent.futures import ThreadPoolExecutor
+from project_snapshot import ProjectSnapshot
+from import_graph import ImportGraph, expand_candidates, prune_unrelated
+from search_index import DEFAULT_MAX_CANDIDATES, rank_files
+from response_cache import DEFAULT_TTL, cached_response, configure_response_cache, print_response_cache_stats
+from token_counter import BPETokenCounter, count_file_tokens, count_tokens, set_token_counter
+
+MODEL = "gpt-4o"
+DEFAULT_CONCURRENCY = 4
+RATE_LIMIT_MAX_RETRIES = 5
+RATE_LIMIT_BASE_DELAY = 1.0
+# Files pulled in through the import graph on top of the ranked candidates
+DEFAULT_MAX_RELATED_FILES = 10
+
+# Created on first use; point OPENAI_BASE_URL at a local OpenAI-compatible server to test offline
+client = None
+
+def get_client():
+    """Return the shared OpenAI client, creating it on first use."""
+    global client
+    if client is None:
+        client = openai.Client()
+    return client
+
+def create_chat_completion(prompt, model=MODEL, max_retries=RATE_LIMIT_MAX_RETRIES, base_delay=RATE_LIMIT_BASE_DELAY):
+    """Send a single-message chat completion, retrying with exponential backoff on rate-limit errors."""
+    for attempt in range(max_retries + 1):
+        try:
+            return get_client().chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "user", "content": prompt}
+                ]
+            )
+        except openai.RateLimitError as e:
+            if attempt == max_retries:
+                raise
+            retry_after = e.response.headers.get("retry-after") if e.response is not None else None
+            try:
+                delay = float(retry_after)
+            except (TypeError, ValueError):
+                delay = base_delay * (2 ** attempt) * (1 + random.random())
+            print(f"Rate limited, retrying in {delay:.1f}s (attempt {attempt + 1}/{max_retries})...")
+            time.sleep(delay)
 
 def estimate_tokens(text):
-    """Estimate token count based on text length (1 token ≈ 4 characters for plain text)."""
-    return len(text) // 4
+    """Count tokens with the active token counter (see token_counter.get_token_counter)."""
+    return count_tokens(text)
 
 def calculate_prompt_token_usage(user_request, chat_history, file_text):
     """Calculate the total token usage for a prompt with given inputs."""
@@ -25,11 +69,13 @@ File Contents:
 """
     return estimate_tokens(fixed_prompt) + estimate_tokens(file_text)
 
-def get_all_file_names_and_sizes(directory="."):
-    """Collect all file names and their sizes in the specified directory."""
-    print(f"Collecting all files from directory: {directory}")
-    files = collect_all_file_contents(directory)
-    file_info_list = [{"file_path": file_path, "file_size": len(content)} for file_path, content in files.items()]
+def get_all_file_names_and_sizes(snapshot):
+    """Collect all file names and their sizes from the project snapshot."""
+    print(f"Collecting all files from directory: {snapshot.directory}")
+    file_info_list = [
+        {"file_path": file_path, "file_size": snapshot.file_size(file_path)}
+        for file_path in snapshot.file_paths()
+    ]
     print(f"Total files collected: {len(file_info_list)}")
     for file in file_info_list:
         print(f"- {file['file_path']}: {file['file_size']} bytes")
@@ -63,23 +109,26 @@ Return the results as a JSON object with the structure:
     print(f"First prompt prepared. Length: {len(prompt)} characters.")
     return prompt
 
+def extract_json(response_content):
+    """Return the JSON object in a model response. Raises ValueError if there is none or it is malformed."""
+    if response_content.startswith("```json"):
+        response_content = response_content.strip("```json").strip()
+    elif response_content.startswith("```"):
+        response_content = response_content.strip("```")
+
+    json_start = response_content.find("{")
+    json_end = response_content.rfind("}") + 1
+
+    if json_start == -1 or json_end == 0:
+        raise ValueError("No JSON block found in the response.")
+
+    return json.loads(response_content[json_start:json_end])
+
 def parse_model_response(response_content):
     """Parse the JSON response from the model."""
     try:
         print("Parsing the model's response...")
-        if response_content.startswith("```json"):
-            response_content = response_content.strip("```json").strip()
-        elif response_content.startswith("```"):
-            response_content = response_content.strip("```")
-        
-        json_start = response_content.find("{")
-        json_end = response_content.rfind("}") + 1
-
-        if json_start == -1 or json_end == -1:
-            raise ValueError("No JSON block found in the response.")
-
-        json_string = response_content[json_start:json_end]
-        result = json.loads(json_string)
+        result = extract_json(response_content)
 
         print(f"Parsed response successfully. Result: {result}")
         return result
@@ -91,36 +140,36 @@ def parse_model_response(response_content):
 def get_files_to_check_from_model(prompt):
     """Send the first prompt to the model to get relevant files."""
     print("Sending the first prompt to the model...")
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "user", "content": prompt}
-        ]
-    )
-    message_content = response.choices[0].message.content
+    message_content = cached_response(MODEL, prompt, lambda: create_chat_completion(prompt).choices[0].message.content, extract_json)
     return parse_model_response(message_content).get("files_to_check", [])
 
-def collect_file_contents(files_to_check, directory=".", max_total_size=1000000):
+def collect_file_contents(files_to_check, snapshot, max_total_size=1000000):
     """Collect file contents for analysis while respecting size limits."""
     print(f"Collecting file contents for {len(files_to_check)} files...")
-    all_file_contents = collect_all_file_contents(directory)
     file_contents = {}
     total_size = 0
     skipped_files = []
 
     for file_path in files_to_check:
-        content = all_file_contents.get(file_path)
+        # Sizes come from the snapshot listing, so files over the limit are never read
+        content_size = snapshot.file_size(file_path)
+        if content_size is None:
+            print(f"File {file_path} not found in the directory.")
+            skipped_files.append(file_path)
+            continue
+
+        if total_size + content_size > max_total_size:
+            print(f"Skipped file {file_path} due to size limit. File size: {content_size} bytes.")
+            skipped_files.append(file_path)
+            continue
+
+        content = snapshot.get_content(file_path)
         if content:
-            content_size = len(content.encode('utf-8'))
-            if total_size + content_size <= max_total_size:
-                file_contents[file_path] = content
-                total_size += content_size
-                print(f"Included file: {file_path}, size: {content_size} bytes, total accumulated size: {total_size} bytes.")
-            else:
-                print(f"Skipped file {file_path} due to size limit. File size: {content_size} bytes.")
-                skipped_files.append(file_path)
+            file_contents[file_path] = content
+            total_size += content_size
+            print(f"Included file: {file_path}, size: {content_size} bytes, total accumulated size: {total_size} bytes.")
         else:
-            print(f"File {file_path} not found in the directory.")
+            print(f"File {file_path} is empty or could not be read.")
             skipped_files.append(file_path)
 
     print(f"Total files included: {len(file_contents)}. Total files skipped: {len(skipped_files)}.")
@@ -129,28 +178,34 @@ def collect_file_contents(files_to_check, directory=".", max_total_size=1000000)
 def prepare_batched_prompts(user_request, chat_history, file_contents, max_tokens=128000):
     """Split file contents into manageable batches within token limits."""
     print("Preparing batched prompts with strict token limits...")
-    batched_prompts = []
-    current_batch = []
-    current_tokens = calculate_prompt_token_usage(user_request, chat_history, "")
-
-    for file_path, content in file_contents.items():
+    prompt_tokens = calculate_prompt_token_usage(user_request, chat_history, "")
+    batch_capacity = max_tokens - prompt_tokens
+    files = []
+    for index, (file_path, content) in enumerate(file_contents.items()):
         file_text = f"File: {file_path}\n{content}\n"
-        file_tokens = estimate_tokens(file_text)
-
-        if current_tokens + file_tokens > max_tokens:
-            # Batch is full; finalize and start a new one
-            print(f"Batch full with {current_tokens} tokens. Starting a new batch...")
-            batched_prompts.append("\n".join(current_batch))
-            current_batch = []
-            current_tokens = calculate_prompt_token_usage(user_request, chat_history, "")
-
-        # Add file to the current batch
-        current_batch.append(file_text)
-        current_tokens += file_tokens
+        # One extra token for the newline joining the files of a batch
+        files.append((index, file_path, file_text, count_file_tokens(file_path, file_text) + 1))
+
+    # First-fit decreasing: place the largest files first, each into the first batch with room
+    batches = []
+    for index, file_path, file_text, file_tokens in sorted(files, key=lambda file: file[3], reverse=True):
+        if file_tokens > batch_capacity:
+            print(f"File {file_path} needs {file_tokens} tokens, more than a batch holds. Sending it alone.")
+        for batch in batches:
+            if batch["tokens"] + file_tokens <= batch_capacity:
+                break
+        else:
+            batch = {"files": [], "tokens": 0}
+            batches.append(batch)
+        batch["files"].append((index, file_text))
+        batch["tokens"] += file_tokens
 
-    # Add the last batch
-    if current_batch:
-        batched_prompts.append("\n".join(current_batch))
+    batched_prompts = []
+    for i, batch in enumerate(batches):
+        total_tokens = prompt_tokens + batch["tokens"]
+        print(f"Batch {i + 1}: {len(batch['files'])} files, {total_tokens}/{max_tokens} tokens ({total_tokens / max_tokens:.0%} full).")
+        # Keep the files of each batch in their original order
+        batched_prompts.append("\n".join(file_text for _, file_text in sorted(batch["files"])))
 
     print(f"Prepared {len(batched_prompts)} batches for processing.")
     return [
@@ -179,38 +234,63 @@ Return the results as a JSON object with the structure:
         for batch in batched_prompts
     ]
 
-def get_files_to_change_from_batched_prompts(prompts):
-    """Process each batch of prompts and aggregate the results."""
+def get_files_to_change_from_batch(prompt, batch_index, batch_count):
+    """Send one batch prompt to the model and return the files it suggests changing."""
+    print(f"Processing batch {batch_index + 1}/{batch_count}...")
+    message_content = cached_response(MODEL, prompt, lambda: create_chat_completion(prompt).choices[0].message.content, extract_json)
+    files_to_change = parse_model_response(message_content).get("files_to_change", [])
+    print(f"Batch {batch_index + 1} suggested {len(files_to_change)} files for changes.")
+    return files_to_change
+
+def get_files_to_change_from_batched_prompts(prompts, max_workers=DEFAULT_CONCURRENCY):
+    """Process the batches of prompts, up to `max_workers` at a time, and aggregate the results in batch order."""
     print("Processing batched prompts...")
-    all_files_to_change = []
-
-    for i, prompt in enumerate(prompts):
-        print(f"Processing batch {i + 1}/{len(prompts)}...")
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
-        )
-        message_content = response.choices[0].message.content
-        files_to_change = parse_model_response(message_content).get("files_to_change", [])
-        print(f"Batch {i + 1} suggested {len(files_to_change)} files for changes.")
-        all_files_to_change.extend(files_to_change)
+    batch_indexes = range(len(prompts))
+    batch_counts = [len(prompts)] * len(prompts)
+
+    if max_workers <= 1 or len(prompts) <= 1:
+        batch_results = list(map(get_files_to_change_from_batch, prompts, batch_indexes, batch_counts))
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(prompts))) as executor:
+            # executor.map yields results in submission order, so the merge is deterministic
+            batch_results = list(executor.map(get_files_to_change_from_batch, prompts, batch_indexes, batch_counts))
+    all_files_to_change = [file for files in batch_results for file in files]
 
     print(f"Total files suggested for changes: {len(all_files_to_change)}")
     return all_files_to_change
 
-def analyze_files_and_requests(user_request, chat_history, directory="."):
-    """Main function to analyze files and requests."""
+def analyze_files_and_requests(user_request, chat_history, snapshot, max_workers=DEFAULT_CONCURRENCY,
+                               model_selection=False, max_candidates=DEFAULT_MAX_CANDIDATES,
+                               max_related_files=DEFAULT_MAX_RELATED_FILES):
+    """
+    Main function to analyze files and requests.
+
+    Candidate files are ranked locally with the search index, most relevant first;
+    with `model_selection`, the model picks them from the file names and sizes instead.
+    The candidates are then expanded with up to `max_related_files` files they import
+    or are imported by. Once the model has chosen files to change, files skipped for
+    size are only analyzed in a further iteration if they are near them in the import
+    graph (or all of them, if none is).
+    """
     print("Starting analysis of files and requests...")
-    file_info_list = get_all_file_names_and_sizes(directory)
-    first_prompt = prepare_first_prompt(user_request, chat_history, file_info_list)
-    files_to_check = get_files_to_check_from_model(first_prompt)
+    if model_selection:
+        file_info_list = get_all_file_names_and_sizes(snapshot)
+        first_prompt = prepare_first_prompt(user_request, chat_history, file_info_list)
+        files_to_check = get_files_to_check_from_model(first_prompt)
+    else:
+        files_to_check = rank_files(f"{user_request}\n{chat_history}", snapshot, max_candidates, use_cache=snapshot.use_cache)
 
     if not files_to_check:
         print("No files to check based on the initial model response.")
         return []
 
+    graph = ImportGraph.build(snapshot, use_cache=snapshot.use_cache)
+    files_to_check = [snapshot.resolve(file_path) or file_path for file_path in files_to_check]
+    if max_related_files:
+        expanded = expand_candidates(files_to_check, graph, len(files_to_check) + max_related_files)
+        print(f"Added {len(expanded) - len(files_to_check)} files related through imports.")
+        files_to_check = expanded
+
     files_to_change = []
     files_already_analyzed = []
     remaining_files = files_to_check
@@ -218,16 +298,22 @@ def analyze_files_and_requests(user_request, chat_history, directory="."):
 
     while remaining_files:
         print(f"\n--- Iteration {iteration} ---")
-        file_contents, skipped_files = collect_file_contents(remaining_files, directory)
+        file_contents, skipped_files = collect_file_contents(remaining_files, snapshot)
         if not file_contents:
             break
 
         batched_prompts = prepare_batched_prompts(user_request, chat_history, file_contents)
-        files_changed_in_this_batch = get_files_to_change_from_batched_prompts(batched_prompts)
+        files_changed_in_this_batch = get_files_to_change_from_batched_prompts(batched_prompts, max_workers)
         files_to_change.extend(files_changed_in_this_batch)
 
         files_already_analyzed.extend(file_contents.keys())
         remaining_files = [f for f in skipped_files if f not in files_already_analyzed]
+        anchors = [snapshot.resolve(file.get('file_path', '')) for file in files_to_change]
+        anchors = [anchor for anchor in anchors if anchor is not None]
+        related_files = prune_unrelated(remaining_files, anchors, graph)
+        if len(related_files) < len(remaining_files):
+            print(f"Pruned {len(remaining_files) - len(related_files)} skipped files unrelated to the files to change.")
+        remaining_files = related_files
         iteration += 1
 
     print("Analysis complete.")
@@ -244,21 +330,41 @@ def copy_to_clipboard(files_to_change, file_contents):
     print("Files and their content copied to clipboard successfully.")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Find the project files a request would change.')
+    parser.add_argument('--no-cache', action='store_true', help='Read every file from disk, ignoring the file cache')
+    parser.add_argument('--bpe-file', help='Count tokens with this tiktoken-format BPE file instead of the 4-characters-per-token estimate')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help=f'Number of batch prompts sent to the model at once (default: {DEFAULT_CONCURRENCY})')
+    parser.add_argument('--model-selection', action='store_true', help='Let the model pick the candidate files from their names instead of ranking them locally')
+    parser.add_argument('--max-candidates', type=int, default=DEFAULT_MAX_CANDIDATES, help=f'Candidate files ranked locally for analysis (default: {DEFAULT_MAX_CANDIDATES})')
+    parser.add_argument('--max-related-files', type=int, default=DEFAULT_MAX_RELATED_FILES, help=f'Files added to the candidates through their imports (default: {DEFAULT_MAX_RELATED_FILES})')
+    parser.add_argument('--no-response-cache', action='store_true', help='Send every prompt to the model, even if an identical one was answered before')
+    parser.add_argument('--response-cache-ttl', type=float, default=DEFAULT_TTL, help=f'Seconds a cached model response stays valid (default: {DEFAULT_TTL})')
+    args = parser.parse_args()
+    configure_response_cache(enabled=not args.no_response_cache, ttl=args.response_cache_ttl)
+    if args.bpe_file:
+        set_token_counter(BPETokenCounter(args.bpe_file))
+
     user_request = "I want that all the google maps api calls will be throught the server. only the get map will be directly to the google api"
     chat_history = ""
     directory = "."
-    
-    # Analyze files and requests
-    files_to_change = analyze_files_and_requests(user_request, chat_history, directory)
-    
-    # Collect content of files that need changes
-    file_contents, _ = collect_file_contents(
-        [file['file_path'] for file in files_to_change], directory
-    )
+
+    # List the project once; file contents are only read when the analysis needs them
+    with ProjectSnapshot(directory, use_cache=not args.no_cache) as snapshot:
+        # Analyze files and requests
+        files_to_change = analyze_files_and_requests(
+            user_request, chat_history, snapshot, args.concurrency, args.model_selection, args.max_candidates,
+            args.max_related_files
+        )
+
+        # Collect content of files that need changes
+        file_contents, _ = collect_file_contents(
+            [file['file_path'] for file in files_to_change], snapshot
+        )
 
     # Copy to clipboard
     copy_to_clipboard(files_to_change, file_contents)
 
     # Print results
     print("\nGPT Analysis Results:")
-    print(json.dumps(files_to_change, indent=2))
\ No newline at end of file
+    print(json.dumps(files_to_change, indent=2))
+    print_response_cache_stats()
\ No newline at end of file
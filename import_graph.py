@@ -0,0 +1,202 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import argparse
+from collections import deque
+from file_cache import CACHE_DIRECTORY
+from project_snapshot import ProjectSnapshot
+
+
+# Static imports and re-exports, bare side-effect imports, require() and dynamic import()
+IMPORT_PATTERN = re.compile(r"""
+    (?:\bimport\s+(?:[\w*$\s{},]+?\s+from\s+)?|\bexport\s+[\w*$\s{},]+?\s+from\s+)(['"])(?P<static>[^'"\n]+)\1
+  | \b(?:require|import)\s*\(\s*(['"])(?P<dynamic>[^'"\n]+)\3\s*\)
+""", re.VERBOSE)
+SOURCE_EXTENSIONS = ('.js', '.jsx')
+RESOLVE_SUFFIXES = ('', '.js', '.jsx', '.json', '.css', '/index.js', '/index.jsx')
+# Kept apart from files.sqlite, so writing imports never waits on the file cache's writes
+IMPORTS_CACHE_NAME = "imports.sqlite"
+
+
+def parse_imports(content):
+    """Return the module specifiers a JS/JSX file imports, in order of appearance."""
+    specifiers = []
+    for match in IMPORT_PATTERN.finditer(content):
+        specifier = match.group("static") or match.group("dynamic")
+        if specifier not in specifiers:
+            specifiers.append(specifier)
+    return specifiers
+
+
+class ImportCache:
+    """
+    Imports of every file, keyed by path, mtime and size like the cached contents,
+    so unchanged files are never re-read to rebuild the graph.
+    """
+
+    def __init__(self, cache_directory=CACHE_DIRECTORY):
+        os.makedirs(cache_directory, exist_ok=True)
+        self.connection = sqlite3.connect(os.path.join(cache_directory, IMPORTS_CACHE_NAME))
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS imports ("
+            "path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, specifiers TEXT NOT NULL)"
+        )
+
+    def get(self, file_path, mtime_ns, size):
+        row = self.connection.execute(
+            "SELECT specifiers FROM imports WHERE path = ? AND mtime_ns = ? AND size = ?",
+            (os.path.abspath(file_path), mtime_ns, size),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, file_path, mtime_ns, size, specifiers):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO imports (path, mtime_ns, size, specifiers) VALUES (?, ?, ?, ?)",
+            (os.path.abspath(file_path), mtime_ns, size, json.dumps(specifiers)),
+        )
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+
+def resolve_import(file_path, specifier, snapshot):
+    """Map a relative import to the snapshot path it refers to, or None for packages and unknown files."""
+    if not specifier.startswith('.'):
+        return None
+    base = os.path.join(os.path.dirname(file_path), specifier)
+    for suffix in RESOLVE_SUFFIXES:
+        resolved = snapshot.resolve(base + suffix)
+        if resolved is not None:
+            return resolved
+    return None
+
+
+class ImportGraph:
+    """
+    Directed graph of the imports between project files, with the reverse edges,
+    answering transitive dependency and dependent queries by breadth-first search.
+    """
+
+    def __init__(self, dependencies):
+        self.dependencies = dependencies
+        self.dependents = {}
+        for file_path, imported_files in dependencies.items():
+            for imported_file in imported_files:
+                self.dependents.setdefault(imported_file, []).append(file_path)
+
+    @classmethod
+    def build(cls, snapshot, use_cache=True):
+        """Build the graph for a snapshot, reading only JS/JSX files whose imports are not cached."""
+        cache = None
+        if use_cache:
+            try:
+                cache = ImportCache()
+            except (OSError, sqlite3.Error) as e:
+                print(f"Import cache unavailable ({e}), parsing every file.")
+        dependencies = {}
+        try:
+            for file_path, stat_result in snapshot.files.items():
+                if not file_path.endswith(SOURCE_EXTENSIONS):
+                    continue
+                specifiers = cache.get(file_path, stat_result.st_mtime_ns, stat_result.st_size) if cache else None
+                if specifiers is None:
+                    content = snapshot.read_content(file_path)
+                    if content is None:
+                        continue
+                    specifiers = parse_imports(content)
+                    if cache:
+                        cache.put(file_path, stat_result.st_mtime_ns, stat_result.st_size, specifiers)
+                resolved = (resolve_import(file_path, specifier, snapshot) for specifier in specifiers)
+                dependencies[file_path] = list(dict.fromkeys(path for path in resolved if path is not None))
+        finally:
+            if cache:
+                cache.close()
+        return cls(dependencies)
+
+    def _walk(self, edges, file_path, max_depth=None):
+        seen = {file_path}
+        order = []
+        queue = deque([(file_path, 0)])
+        while queue:
+            current, depth = queue.popleft()
+            if max_depth is not None and depth == max_depth:
+                continue
+            for neighbour in edges.get(current, []):
+                if neighbour not in seen:
+                    seen.add(neighbour)
+                    order.append(neighbour)
+                    queue.append((neighbour, depth + 1))
+        return order
+
+    def dependencies_of(self, file_path, max_depth=None):
+        """Files `file_path` imports, directly or transitively, nearest first."""
+        return self._walk(self.dependencies, file_path, max_depth)
+
+    def dependents_of(self, file_path, max_depth=None):
+        """Files importing `file_path`, directly or transitively, nearest first."""
+        return self._walk(self.dependents, file_path, max_depth)
+
+    def related(self, file_path, max_depth=1):
+        """Dependencies and dependents of a file within max_depth imports."""
+        return self.dependencies_of(file_path, max_depth) + self.dependents_of(file_path, max_depth)
+
+
+def expand_candidates(files, graph, max_files):
+    """
+    Add the direct imports and importers of the candidate files after them, up to max_files.
+
+    The candidates keep their order; related files follow in the order of the
+    candidate they were reached from.
+    """
+    expanded = list(dict.fromkeys(files))
+    seen = set(expanded)
+    for file_path in list(expanded):
+        for related_file in graph.related(file_path):
+            if len(expanded) >= max_files:
+                return expanded
+            if related_file not in seen:
+                seen.add(related_file)
+                expanded.append(related_file)
+    return expanded
+
+
+def prune_unrelated(files, anchors, graph, max_depth=2):
+    """
+    Keep only the files within max_depth imports of one of the anchor files.
+
+    Without anchors, or when none of the files is related to them, nothing is
+    known to rule files out, so they are all kept.
+    """
+    if not anchors:
+        return list(files)
+    related_files = set(anchors)
+    for anchor in anchors:
+        related_files.update(graph.related(anchor, max_depth))
+    return [file_path for file_path in files if file_path in related_files] or list(files)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Show what a project file imports and what imports it.')
+    parser.add_argument('file', help='Project file to query, e.g. src/services/api.js')
+    parser.add_argument('--directory', default='.', help='Project directory (default: .)')
+    parser.add_argument('--depth', type=int, help='Follow imports at most this many levels (default: transitive)')
+    parser.add_argument('--no-cache', action='store_true', help='Parse every file, ignoring the cached imports')
+    args = parser.parse_args()
+
+    with ProjectSnapshot(args.directory, use_cache=not args.no_cache) as snapshot:
+        start_time = time.perf_counter()
+        graph = ImportGraph.build(snapshot, use_cache=not args.no_cache)
+        print(f"Import graph: {len(graph.dependencies)} files in {(time.perf_counter() - start_time) * 1000:.1f} ms")
+        file_path = snapshot.resolve(args.file) or snapshot.resolve(os.path.join(args.directory, args.file))
+        if file_path is None:
+            raise SystemExit(f"{args.file} is not a project file")
+
+        print(f"\n{file_path} depends on:")
+        for dependency in graph.dependencies_of(file_path, args.depth):
+            print(f"- {dependency}")
+        print(f"\nDepending on {file_path}:")
+        for dependent in graph.dependents_of(file_path, args.depth):
+            print(f"- {dependent}")
@@ -1,44 +1,54 @@
 import os
-import pyperclip
+import sys
 import argparse
+from file_collector import CLIPBOARD, limit_output, write_output
 
-def print_file_contents(directory, file_extension, output, exclude_files=[], exclude_directories=[]):
+OUTPUT_HEADER = "here is my files' content:\n"
+
+
+def iter_file_contents(directory, file_extension, exclude_files=[], exclude_directories=[]):
+    """Yield one "<path>:\\nFile Content:\\n..." block per matching file, reading one file at a time."""
     for root, dirs, files in os.walk(directory):
         # Exclude specified directories
         dirs[:] = [d for d in dirs if d not in ['__pycache__', '.serverless', 'venv', 'node_modules', '.venv']]
-        for directory in exclude_directories:
-            if directory in dirs:
-                dirs.remove(directory)
+        for excluded_directory in exclude_directories:
+            if excluded_directory in dirs:
+                dirs.remove(excluded_directory)
         
         for file in files:
             if file in exclude_files:
-                print(f"excluding file: {file}")
+                print(f"excluding file: {file}", file=sys.stderr)
                 continue
         
             if file.endswith(file_extension) or file == 'serverless.yml':
-                print(f"file: {file}")
+                print(f"file: {file}", file=sys.stderr)
                 file_path = os.path.join(root, file)
-                output += f"<{file_path}>:\n"
-                output += "File Content:\n"
                 with open(file_path, 'r') as f:
                     content = f.read()
-                    output += content
-                output += "\n"
-    return output
+                yield f"<{file_path}>:\nFile Content:\n{content}\n"
+
+
+def print_file_contents(directory, file_extension, output, exclude_files=[], exclude_directories=[]):
+    return output + "".join(iter_file_contents(directory, file_extension, exclude_files, exclude_directories))
+
+
+def iter_all_file_contents(directory="."):
+    """Yield the header and then the blocks of the .js, .jsx, .css and .json files, in that order."""
+    yield OUTPUT_HEADER
+    yield from iter_file_contents(directory, '.js', exclude_files=['main.js', ".DS_Store"], exclude_directories=['node_modules'])
+    yield from iter_file_contents(directory, '.jsx', exclude_files=[], exclude_directories=['node_modules'])
+    yield from iter_file_contents(directory, '.css', exclude_files=['main.js', ".DS_Store"], exclude_directories=['node_modules'])
+    yield from iter_file_contents(directory, '.json', exclude_files=[], exclude_directories=['node_modules'])
+
 
 def collect_all_file_contents(directory="."):
-    output = ""
-    output += "here is my files' content:\n"
-    output = print_file_contents(project_directory, '.js', output, exclude_files=['main.js', ".DS_Store"], exclude_directories=['node_modules'])
-    output = print_file_contents(project_directory, '.jsx', output, exclude_files=[], exclude_directories=['node_modules'])
-    output = print_file_contents(project_directory, '.css', output, exclude_files=['main.js', ".DS_Store"], exclude_directories=['node_modules'])
-    output = print_file_contents(project_directory, '.json', output, exclude_files=[], exclude_directories=['node_modules'])
-    return output
+    return "".join(iter_all_file_contents(directory))
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Process project directory files.')
     parser.add_argument('project_directory', nargs='?', default='src', help='Project directory to search (default: src)')
+    parser.add_argument('--output', default=CLIPBOARD, help='Where to write the contents: clipboard (default), - for stdout, or a file path')
+    parser.add_argument('--max-bytes', type=int, help='Stop writing file contents after this many bytes')
     args = parser.parse_args()
     project_directory = args.project_directory
-    output = collect_all_file_contents(project_directory)
-    pyperclip.copy(output)
\ No newline at end of file
+    write_output(limit_output(iter_all_file_contents(project_directory), args.max_bytes), args.output)
@@ -0,0 +1,102 @@
+import os
+from file_cache import open_file_cache
+from file_collector import list_project_files, new_scan_stats, read_file
+
+
+class ProjectSnapshot:
+    """
+    Listing of the project files taken once, with file contents loaded on demand.
+
+    The snapshot is meant to be created once per analysis and passed through the
+    whole pipeline, so only the files that are actually needed are ever read.
+    """
+
+    def __init__(self, directory=".", use_cache=True):
+        self.directory = directory
+        self.use_cache = use_cache
+        self.stats = new_scan_stats()
+        self.files = list_project_files(directory, stats=self.stats)
+        self._paths_by_normalized_path = {os.path.normpath(path): path for path in self.files}
+        self._contents = {}
+        self._cache = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __contains__(self, file_path):
+        return self.resolve(file_path) is not None
+
+    def __len__(self):
+        return len(self.files)
+
+    def resolve(self, file_path):
+        """Map a path as written by a user or model (e.g. without a leading './') to its snapshot key."""
+        if file_path in self.files:
+            return file_path
+        return self._paths_by_normalized_path.get(os.path.normpath(file_path))
+
+    def file_paths(self):
+        """Return all file paths in collection order."""
+        return list(self.files)
+
+    def file_size(self, file_path):
+        """Return the size in bytes of a file, or None if it is not part of the snapshot."""
+        file_path = self.resolve(file_path)
+        if file_path is None:
+            return None
+        return self.files[file_path].st_size
+
+    def get_content(self, file_path):
+        """Return the content of a file, reading it on first access. Returns None if unreadable."""
+        file_path = self.resolve(file_path)
+        if file_path is None:
+            return None
+        if file_path not in self._contents:
+            self._contents[file_path] = self.read_content(file_path)
+        return self._contents[file_path]
+
+    def read_content(self, file_path):
+        """
+        Return the content of a file without keeping it in memory, for passes over the
+        whole project (e.g. indexing). Reuses the content if it is already loaded.
+        Returns None if unreadable.
+        """
+        file_path = self.resolve(file_path)
+        if file_path is None:
+            return None
+        if file_path in self._contents:
+            return self._contents[file_path]
+
+        if self._cache is None and self.use_cache:
+            self._cache = open_file_cache(self.use_cache)
+            self.use_cache = self._cache is not None
+        try:
+            content = read_file(file_path, self._cache, self.files[file_path])
+            self.stats["files_read"] += 1
+        except UnicodeDecodeError:
+            print(f"Skipping file (encoding issue): {file_path}")
+            content = None
+        except Exception as e:
+            print(f"Skipping file ({e}): {file_path}")
+            content = None
+        return content
+
+    def get_contents(self, file_paths=None):
+        """Return `{file_path: content}` for the given files (all files by default), skipping unreadable ones."""
+        if file_paths is None:
+            file_paths = self.files
+        contents = {}
+        for file_path in file_paths:
+            content = self.get_content(file_path)
+            if content is not None:
+                contents[self.resolve(file_path)] = content
+        return contents
+
+    def close(self):
+        """Flush and close the file cache, if one was opened."""
+        if self._cache is not None:
+            self._cache.close()
+            self._cache = None
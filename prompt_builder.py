@@ -0,0 +1,96 @@
+import logging
+from token_counter import count_tokens
+
+logger = logging.getLogger(__name__)
+
+TRUNCATION_NOTICE = "\n... [truncated {omitted} of {total} bytes]\n"
+
+
+def utf8_size(text):
+    return len(text.encode("utf-8"))
+
+
+class PromptBuilder:
+    """
+    Assembles a prompt from a list of parts, joined once in `build()`.
+
+    Optional byte and token budgets bound the whole prompt, including the footer.
+    Parts added with `add()` always go in; parts added with `add_within_budget()`
+    are replaced by their summary, or truncated, when they do not fit.
+    """
+
+    def __init__(self, max_bytes=None, max_tokens=None):
+        self.max_bytes = max_bytes
+        self.max_tokens = max_tokens
+        self.size = 0
+        self.tokens = 0
+        self._parts = []
+        self._footer = ""
+
+    def _account(self, text, sign=1):
+        self.size += sign * utf8_size(text)
+        if self.max_tokens is not None:
+            self.tokens += sign * count_tokens(text)
+
+    def set_footer(self, text):
+        """Set the text that closes the prompt. It is counted against the budget right away."""
+        self._account(self._footer, -1)
+        self._footer = text
+        self._account(text)
+
+    def fits(self, text):
+        """Return True if the text fits in the remaining budget."""
+        if self.max_bytes is not None and self.size + utf8_size(text) > self.max_bytes:
+            return False
+        if self.max_tokens is not None and self.tokens + count_tokens(text) > self.max_tokens:
+            return False
+        return True
+
+    def add(self, text):
+        """Append text regardless of the budget."""
+        self._parts.append(text)
+        self._account(text)
+
+    def add_within_budget(self, text, summary=None):
+        """
+        Append text if it fits; otherwise its summary if that fits; otherwise as much of it as fits.
+
+        Returns "full", "summarized", "truncated" or "omitted".
+        """
+        if self.fits(text):
+            self.add(text)
+            return "full"
+        if summary is not None and self.fits(summary):
+            self.add(summary)
+            return "summarized"
+
+        prefix = self._longest_fitting_prefix(text)
+        if not prefix:
+            return "omitted"
+        self.add(prefix)
+        return "truncated"
+
+    def add_file(self, header, content, summary=None):
+        """Append a file's header and content, summarizing or truncating the content if it does not fit."""
+        status = self.add_within_budget(header + content + "\n", summary=header + summary + "\n" if summary else None)
+        logger.debug("%s %s", status, header.strip())
+        return status
+
+    def _longest_fitting_prefix(self, text):
+        """Binary-search the longest prefix of text that fits together with a truncation notice."""
+        total = utf8_size(text)
+        low, high = 0, len(text)
+        best = ""
+        while low <= high:
+            middle = (low + high) // 2
+            candidate = text[:middle] + TRUNCATION_NOTICE.format(omitted=total - utf8_size(text[:middle]), total=total)
+            if self.fits(candidate):
+                best = candidate
+                low = middle + 1
+            else:
+                high = middle - 1
+        return best
+
+    def build(self):
+        """Join all parts and the footer into the final prompt."""
+        return "".join(self._parts) + self._footer
@@ -0,0 +1,164 @@
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+from file_cache import CACHE_DIRECTORY
+
+
+RESPONSES_CACHE_NAME = "responses.sqlite"
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 1000
+
+
+def response_key(model, prompt):
+    """Cache key of a model call: the model name and a SHA-256 of the prompt."""
+    return f"{model}:{hashlib.sha256(prompt.encode('utf-8')).hexdigest()}"
+
+
+class ResponseCache:
+    """
+    On-disk cache of model responses, keyed by model name and prompt hash.
+
+    Entries older than `ttl` seconds are never served. When there are more than
+    `max_entries`, the least recently used ones are evicted. Every write is
+    committed right away, so responses survive a crash of the calling script.
+    Safe to share between threads.
+    """
+
+    def __init__(self, cache_directory=CACHE_DIRECTORY, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        os.makedirs(cache_directory, exist_ok=True)
+        self.path = os.path.join(cache_directory, RESPONSES_CACHE_NAME)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, created_at REAL NOT NULL, last_used REAL NOT NULL, response TEXT NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self.connection.commit()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, model, prompt):
+        """Return the cached response for a prompt sent to a model, or None if it is missing or expired."""
+        key = response_key(model, prompt)
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.ttl is not None and now - row[1] > self.ttl):
+                if row is not None:
+                    self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self.connection.commit()
+                self.misses += 1
+                return None
+            self.connection.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self.connection.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, model, prompt, response):
+        """Store a response, evicting the least recently used entries beyond max_entries."""
+        now = time.time()
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses (key, created_at, last_used, response) VALUES (?, ?, ?, ?)",
+                (response_key(model, prompt), now, now, response),
+            )
+            if self.max_entries is not None:
+                self.connection.execute(
+                    "DELETE FROM responses WHERE key NOT IN "
+                    "(SELECT key FROM responses ORDER BY last_used DESC LIMIT ?)",
+                    (self.max_entries,),
+                )
+            self.connection.commit()
+
+    def delete(self, model, prompt):
+        """Remove the cached response for a prompt sent to a model, if any."""
+        with self.lock:
+            self.connection.execute("DELETE FROM responses WHERE key = ?", (response_key(model, prompt),))
+            self.connection.commit()
+
+    def close(self):
+        """Close the database."""
+        with self.lock:
+            self.connection.close()
+
+
+def open_response_cache(use_cache=True, cache_directory=CACHE_DIRECTORY, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+    """Open the response cache, or return None when caching is disabled or unavailable."""
+    if not use_cache:
+        return None
+    try:
+        return ResponseCache(cache_directory, ttl, max_entries)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Response cache unavailable ({e}), sending every request to the model.")
+        return None
+
+
+_response_cache = None
+_response_cache_enabled = True
+_response_cache_options = {}
+
+
+def configure_response_cache(enabled=True, **options):
+    """Enable or bypass the shared response cache, and set its `ttl` and `max_entries` before first use."""
+    global _response_cache, _response_cache_enabled, _response_cache_options
+    if _response_cache is not None:
+        _response_cache.close()
+        _response_cache = None
+    _response_cache_enabled = enabled
+    _response_cache_options = options
+
+
+def get_response_cache():
+    """Return the shared response cache, opening it on first use. None when bypassed or unavailable."""
+    global _response_cache, _response_cache_enabled
+    if _response_cache is None and _response_cache_enabled:
+        _response_cache = open_response_cache(**_response_cache_options)
+        _response_cache_enabled = _response_cache is not None
+    return _response_cache
+
+
+def cached_response(model, prompt, send, validate=None):
+    """
+    Return the cached response to `prompt` for `model`, or call `send()` and cache its result.
+
+    `send` returns the response text; a None result (a failed call) is not cached.
+    `validate`, if given, is called with a response and raises ValueError when it is
+    unusable (e.g. truncated JSON): such a response is returned but never cached,
+    and a cached one is evicted and the prompt sent again.
+    """
+    def is_valid(response):
+        if validate is None:
+            return True
+        try:
+            validate(response)
+            return True
+        except ValueError:
+            return False
+
+    cache = get_response_cache()
+    if cache is None:
+        return send()
+    response = cache.get(model, prompt)
+    if response is not None and not is_valid(response):
+        print(f"Cached {model} response is invalid, sending the prompt again.")
+        cache.delete(model, prompt)
+        response = None
+    if response is None:
+        response = send()
+        if response is not None and is_valid(response):
+            cache.put(model, prompt, response)
+    return response
+
+
+def print_response_cache_stats():
+    """Print how many model calls the shared response cache answered."""
+    cache = get_response_cache()
+    if cache is not None:
+        print(f"Response cache: {cache.hits} hits, {cache.misses} misses")
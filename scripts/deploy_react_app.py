@@ -1,109 +1,389 @@
 import os
+import gzip
+import json
 import boto3
+import hashlib
+import threading
+import argparse
 import mimetypes
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
 
-def deploy_react_app(build_dir='build', stage='dev'):
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DEFAULT_CONCURRENCY = 8
+# Files up to this size are uploaded in one part, so their ETag is their MD5;
+# larger files are uploaded in parts of this size and get a multipart ETag
+MULTIPART_CHUNKSIZE = 64 * 1024 * 1024
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=MULTIPART_CHUNKSIZE,
+    multipart_chunksize=MULTIPART_CHUNKSIZE,
+    use_threads=False,
+)
+ENTRY_POINT = 'index.html'
+DELETE_BATCH_SIZE = 1000
+DISTRIBUTION_CACHE_FILE = os.path.join('.scalez_cache', 'cloudfront_distributions.json')
+# Above this many paths a single "/*" wildcard is cheaper than listing them
+MAX_INVALIDATION_PATHS = 15
+COMPRESSION_CACHE_DIRECTORY = os.path.join('.scalez_cache', 'compressed')
+COMPRESSIBLE_EXTENSIONS = {'.js', '.css', '.json', '.html', '.svg', '.txt', '.map', '.xml'}
+# Below this size the encoding overhead outweighs the savings
+MIN_COMPRESS_SIZE = 1024
+
+
+def get_content_type(path):
+    """Guess a file's content type, with fallbacks for the web types mimetypes may not know."""
+    content_type = mimetypes.guess_type(str(path))[0]
+    if content_type is None:
+        if path.suffix == '.js':
+            content_type = 'application/javascript'
+        elif path.suffix == '.css':
+            content_type = 'text/css'
+        elif path.suffix == '.json':
+            content_type = 'application/json'
+        else:
+            content_type = 'application/octet-stream'
+    return content_type
+
+
+def get_cache_control(relative_path):
+    """Caching headers: never cache index.html, cache hashed static assets forever."""
+    if relative_path == ENTRY_POINT:
+        return 'no-cache, no-store, must-revalidate'
+    if any(relative_path.startswith(prefix) for prefix in ['static/', 'assets/']):
+        return 'public, max-age=31536000, immutable'
+    return 'public, max-age=3600'
+
+
+def compute_etag(path, chunk_size=MULTIPART_CHUNKSIZE):
+    """Compute the ETag S3 gives a file uploaded with TRANSFER_CONFIG: its MD5, or the multipart ETag."""
+    part_digests = []
+    with open(path, 'rb') as f:
+        if os.path.getsize(path) < chunk_size:
+            return hashlib.md5(f.read()).hexdigest()
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            part_digests.append(hashlib.md5(chunk).digest())
+    return f'{hashlib.md5(b"".join(part_digests)).hexdigest()}-{len(part_digests)}'
+
+
+def list_local_files(build_dir):
+    """Return `{object key: path}` for every file under the build directory."""
+    files = {}
+    build_path = Path(build_dir)
+    for path in build_path.rglob('*'):
+        if path.is_dir():
+            continue
+        # Normalize path separators
+        relative_path = str(path.relative_to(build_dir)).replace('\\', '/')
+        files[relative_path] = path
+    return files
+
+
+def list_bucket_objects(s3, bucket_name):
+    """List the bucket once and return `{object key: ETag}`."""
+    objects = {}
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket_name):
+        for item in page.get('Contents', []):
+            objects[item['Key']] = item['ETag'].strip('"')
+    return objects
+
+
+def plan_deployment(local_files, remote_objects):
+    """Return (keys to upload, stale keys to delete): new or changed files, and objects with no local file."""
+    to_upload = [key for key, path in local_files.items() if remote_objects.get(key) != compute_etag(path)]
+    stale = [key for key in remote_objects if key not in local_files]
+    return to_upload, stale
+
+
+def upload_file(s3, bucket_name, relative_path, path, content_encoding=None):
+    """Upload one file with its content type and caching headers. `path` may hold a pre-compressed body."""
+    content_type = get_content_type(Path(relative_path))
+    extra_args = {
+        'ContentType': content_type,
+        'CacheControl': get_cache_control(relative_path),
+    }
+    if content_encoding:
+        extra_args['ContentEncoding'] = content_encoding
+        print(f'Uploading: {relative_path} ({content_type}, {content_encoding})')
+    else:
+        print(f'Uploading: {relative_path} ({content_type})')
+    s3.upload_file(
+        str(path),
+        bucket_name,
+        relative_path,
+        ExtraArgs=extra_args,
+        Config=TRANSFER_CONFIG,
+    )
+
+
+def delete_objects(s3, bucket_name, keys):
+    """Delete objects in batches of up to 1000 keys, the S3 limit per request."""
+    for i in range(0, len(keys), DELETE_BATCH_SIZE):
+        batch = keys[i:i + DELETE_BATCH_SIZE]
+        for key in batch:
+            print(f'Deleting: {key}')
+        s3.delete_objects(
+            Bucket=bucket_name,
+            Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True},
+        )
+
+
+def gzip_encode(data):
+    # mtime=0 keeps the output, and so the ETag, identical across deploys
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def brotli_encode(data):
+    return brotli.compress(data, quality=11)
+
+
+ENCODERS = {'gzip': gzip_encode, 'br': brotli_encode}
+
+
+def available_encodings():
+    """Content encodings this machine can produce: gzip always, brotli when the package is installed."""
+    return ['gzip', 'br'] if brotli is not None else ['gzip']
+
+
+def compress_file(path, encodings, cache_directory=COMPRESSION_CACHE_DIRECTORY):
+    """
+    Encode a file with every encoding and return (original size, {encoding: encoded path}).
+
+    Outputs are cached by content hash, so unchanged assets are never re-encoded.
+    """
+    data = Path(path).read_bytes()
+    digest = hashlib.sha256(data).hexdigest()
+    outputs = {}
+    for encoding in encodings:
+        output_path = Path(cache_directory) / f'{digest}.{encoding}'
+        if not output_path.exists():
+            temp_path = output_path.with_name(f'{output_path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+            temp_path.write_bytes(ENCODERS[encoding](data))
+            os.replace(temp_path, output_path)
+        outputs[encoding] = output_path
+    return len(data), outputs
+
+
+def compress_assets(local_files, encoding, concurrency=DEFAULT_CONCURRENCY, cache_directory=COMPRESSION_CACHE_DIRECTORY):
+    """
+    Pre-compress the text assets of the build in parallel.
+
+    Every available encoding is produced for the size report; the returned
+    `{key: encoded path}` uses `encoding`, for files it actually makes smaller.
+    """
+    if encoding not in available_encodings():
+        raise ValueError(f'Unsupported compression: {encoding} (available: {", ".join(available_encodings())})')
+    os.makedirs(cache_directory, exist_ok=True)
+    encodings = available_encodings()
+    keys = [
+        key for key, path in local_files.items()
+        if path.suffix in COMPRESSIBLE_EXTENSIONS and path.stat().st_size >= MIN_COMPRESS_SIZE
+    ]
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        results = list(executor.map(lambda key: compress_file(local_files[key], encodings, cache_directory), keys))
+
+    compressed = {}
+    report = []
+    for key, (size, outputs) in zip(keys, results):
+        sizes = {name: output_path.stat().st_size for name, output_path in outputs.items()}
+        report.append((key, size, sizes))
+        if sizes[encoding] < size:
+            compressed[key] = outputs[encoding]
+    print_compression_report(report, encodings)
+    return compressed
+
+
+def print_compression_report(report, encodings):
+    """Print the size of every compressed asset before and after each encoding, and the totals."""
+    if not report:
+        return
+    print('Compression report:')
+    print(f'{"File":<50} {"Original":>10} ' + ' '.join(f'{name:>10}' for name in encodings))
+    for key, size, sizes in report:
+        print(f'{key:<50} {size:>10} ' + ' '.join(f'{sizes[name]:>10}' for name in encodings))
+    total = sum(size for _, size, _ in report)
+    totals = {name: sum(sizes[name] for _, _, sizes in report) for name in encodings}
+    print(f'{"Total":<50} {total:>10} ' + ' '.join(f'{totals[name]:>10}' for name in encodings))
+    for name in encodings:
+        print(f'- {name}: {total} -> {totals[name]} bytes ({100 * (1 - totals[name] / total):.1f}% smaller)')
+
+
+def sync_build_to_bucket(s3, build_dir, bucket_name, concurrency=DEFAULT_CONCURRENCY, delete_stale=True,
+                         compression=None):
+    """
+    Upload new and changed files of the build directory and return the keys of
+    every object that changed, uploaded or deleted.
+
+    Assets are uploaded concurrently; index.html goes last, once everything it
+    references is in place, and stale objects are only deleted after that.
+    With `compression` ("gzip" or "br"), text assets are uploaded pre-compressed.
+    """
+    local_files = list_local_files(build_dir)
+    compressed = compress_assets(local_files, compression, concurrency) if compression else {}
+    # The bodies to upload, so ETags are compared with what is actually stored
+    bodies = {key: compressed.get(key, path) for key, path in local_files.items()}
+    remote_objects = list_bucket_objects(s3, bucket_name)
+    to_upload, stale = plan_deployment(bodies, remote_objects)
+    print(f'{len(local_files)} files, {len(to_upload)} new or changed, {len(stale)} stale')
+
+    encodings = {key: compression for key in compressed}
+    assets = [key for key in to_upload if key != ENTRY_POINT]
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        # list() re-raises the first upload error before index.html is switched over
+        list(executor.map(lambda key: upload_file(s3, bucket_name, key, bodies[key], encodings.get(key)), assets))
+    if ENTRY_POINT in to_upload:
+        upload_file(s3, bucket_name, ENTRY_POINT, bodies[ENTRY_POINT], encodings.get(ENTRY_POINT))
+
+    if not delete_stale:
+        return to_upload
+    if stale:
+        delete_objects(s3, bucket_name, stale)
+    return to_upload + stale
+
+
+def load_distribution_cache(cache_file=DISTRIBUTION_CACHE_FILE):
+    """Load the `{stage: {"id", "domain_name"}}` distributions resolved by earlier deploys."""
+    try:
+        with open(cache_file, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_distribution_cache(cache, cache_file=DISTRIBUTION_CACHE_FILE):
+    os.makedirs(os.path.dirname(cache_file) or '.', exist_ok=True)
+    with open(cache_file, 'w') as f:
+        json.dump(cache, f, indent=2)
+
+
+def find_distribution(cloudfront, bucket_name):
+    """Page through all distributions and return the one with an origin in the bucket, or None."""
+    origin_prefix = f'{bucket_name}.s3'
+    paginator = cloudfront.get_paginator('list_distributions')
+    for page in paginator.paginate():
+        for distribution in page['DistributionList'].get('Items', []):
+            origins = distribution['Origins'].get('Items', [])
+            if any(origin['DomainName'].startswith(origin_prefix) for origin in origins):
+                return {'id': distribution['Id'], 'domain_name': distribution['DomainName']}
+    return None
+
+
+def resolve_distribution(cloudfront, stage, bucket_name, refresh=False, cache_file=DISTRIBUTION_CACHE_FILE):
+    """Return the stage's distribution, looked up once and then served from the cache file."""
+    cache = load_distribution_cache(cache_file)
+    if not refresh and stage in cache:
+        return cache[stage]
+    distribution = find_distribution(cloudfront, bucket_name)
+    if distribution:
+        cache[stage] = distribution
+        save_distribution_cache(cache, cache_file)
+    return distribution
+
+
+def get_invalidation_paths(changed_keys):
+    """
+    CloudFront paths to invalidate for the changed objects.
+
+    Immutable assets are left out: their names change with their content, so no edge
+    holds a stale copy. index.html is also served as "/". Falls back to "/*" when
+    there are too many paths to list.
+    """
+    paths = []
+    for key in changed_keys:
+        if 'immutable' in get_cache_control(key):
+            continue
+        paths.append(f'/{key}')
+        if key == ENTRY_POINT:
+            paths.append('/')
+    if len(paths) > MAX_INVALIDATION_PATHS:
+        return ['/*']
+    return sorted(paths)
+
+
+def create_invalidation(cloudfront, distribution_id, paths):
+    cloudfront.create_invalidation(
+        DistributionId=distribution_id,
+        InvalidationBatch={
+            'Paths': {
+                'Quantity': len(paths),
+                'Items': paths
+            },
+            'CallerReference': str(time.time_ns())
+        }
+    )
+
+
+def deploy_react_app(build_dir='build', stage='dev', concurrency=DEFAULT_CONCURRENCY, delete_stale=True,
+                     compression=None, s3=None, cloudfront=None):
     """
     Deploy React app to S3 and invalidate CloudFront cache
     
     Parameters:
     build_dir (str): Path to React build directory
     stage (str): Deployment stage (dev, prod, etc.)
+    concurrency (int): Number of parallel uploads
+    delete_stale (bool): Delete bucket objects that are no longer in the build
+    compression (str): Upload text assets pre-compressed with "gzip" or "br"
+    s3, cloudfront: boto3 clients to use instead of the default ones (e.g. in tests)
     """
     # Initialize AWS clients
-    s3 = boto3.client('s3')
-    cloudfront = boto3.client('cloudfront')
+    s3 = s3 or boto3.client('s3')
+    cloudfront = cloudfront or boto3.client('cloudfront')
     
     # Get bucket name and CloudFront distribution ID from environment or parameters
     bucket_name = f'scale-management-system-website-{stage}'
     
     print(f'Deploying to bucket: {bucket_name}')
     
-    # Walk through the build directory
-    build_path = Path(build_dir)
-    for path in build_path.rglob('*'):
-        # Skip directories
-        if path.is_dir():
-            continue
-            
-        # Get relative path
-        relative_path = str(path.relative_to(build_dir))
-        
-        # Normalize path separators
-        relative_path = relative_path.replace('\\', '/')
-        
-        # Guess content type
-        content_type = mimetypes.guess_type(str(path))[0]
-        if content_type is None:
-            if path.suffix == '.js':
-                content_type = 'application/javascript'
-            elif path.suffix == '.css':
-                content_type = 'text/css'
-            elif path.suffix == '.json':
-                content_type = 'application/json'
-            else:
-                content_type = 'application/octet-stream'
-        
-        print(f'Uploading: {relative_path} ({content_type})')
-        
-        # Upload file
-        with path.open('rb') as f:
-            extra_args = {
-                'ContentType': content_type,
-            }
-            
-            # Set appropriate caching headers
-            if relative_path == 'index.html':
-                extra_args['CacheControl'] = 'no-cache, no-store, must-revalidate'
-            elif any(relative_path.startswith(prefix) for prefix in ['static/', 'assets/']):
-                extra_args['CacheControl'] = 'public, max-age=31536000, immutable'
-            else:
-                extra_args['CacheControl'] = 'public, max-age=3600'
-                
-            s3.upload_fileobj(
-                f,
-                bucket_name,
-                relative_path,
-                ExtraArgs=extra_args
-            )
+    changed = sync_build_to_bucket(s3, build_dir, bucket_name, concurrency=concurrency, delete_stale=delete_stale,
+                                   compression=compression)
     
     print('Upload complete!')
     
     # Get CloudFront distribution ID and domain name
-    response = cloudfront.list_distributions()
-    distribution_id = None
-    domain_name = None
-    
-    for distribution in response['DistributionList']['Items']:
-        if f'{bucket_name}.s3' in distribution['Origins']['Items'][0]['DomainName']:
-            distribution_id = distribution['Id']
-            domain_name = distribution['DomainName']
-            break
+    distribution = resolve_distribution(cloudfront, stage, bucket_name)
+    domain_name = distribution['domain_name'] if distribution else None
+    paths = get_invalidation_paths(changed)
     
-    if distribution_id:
-        print(f'Creating CloudFront invalidation for distribution: {distribution_id}')
-        cloudfront.create_invalidation(
-            DistributionId=distribution_id,
-            InvalidationBatch={
-                'Paths': {
-                    'Quantity': 1,
-                    'Items': ['/*']
-                },
-                'CallerReference': str(int(time.time()))
-            }
-        )
+    if distribution and paths:
+        print(f'Creating CloudFront invalidation for distribution: {distribution["id"]} ({", ".join(paths)})')
+        try:
+            create_invalidation(cloudfront, distribution['id'], paths)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'NoSuchDistribution':
+                raise
+            # The cached distribution was deleted or replaced; look it up again
+            distribution = resolve_distribution(cloudfront, stage, bucket_name, refresh=True)
+            if distribution is None:
+                raise
+            domain_name = distribution['domain_name']
+            create_invalidation(cloudfront, distribution['id'], paths)
         print('CloudFront invalidation created!')
-        
-        if domain_name:
-            print('\nYour application is available at:')
-            print(f'https://{domain_name}')
-            print('\nNote: It may take a few minutes for the CloudFront invalidation to complete.')
+    elif distribution:
+        print('No cached paths changed, skipping CloudFront invalidation')
+    
+    if domain_name:
+        print('\nYour application is available at:')
+        print(f'https://{domain_name}')
+        print('\nNote: It may take a few minutes for the CloudFront invalidation to complete.')
     
     print('\nDeployment completed successfully!')
+    return changed
 
 if __name__ == '__main__':
-    import sys
-    stage = sys.argv[1] if len(sys.argv) > 1 else 'dev'
-    deploy_react_app(stage=stage)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Deploy the React build to S3 and CloudFront.')
+    parser.add_argument('stage', nargs='?', default='dev', help='Deployment stage (default: dev)')
+    parser.add_argument('--build-dir', default='build', help='React build directory (default: build)')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help=f'Parallel uploads (default: {DEFAULT_CONCURRENCY})')
+    parser.add_argument('--keep-stale', action='store_true', help='Keep bucket objects that are no longer in the build')
+    parser.add_argument('--compress', choices=sorted(ENCODERS), help='Upload text assets pre-compressed with gzip or brotli (br)')
+    args = parser.parse_args()
+    deploy_react_app(args.build_dir, args.stage, concurrency=args.concurrency, delete_stale=not args.keep_stale,
+                     compression=args.compress)
\ No newline at end of file
@@ -1,17 +1,382 @@
 import json
 import os
+import time
+import hashlib
+import argparse
+import tempfile
 import re
-from typing import List, Dict, Tuple
+import random
+import heapq
+import difflib
+from collections import Counter, deque
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Iterator, List, Dict, Optional, Tuple
 from anthropic import Anthropic
 
+
+class _Piece:
+    """A run of lines `lines[start:end]`, stored as a node of a treap ordered by position."""
+    __slots__ = ("lines", "start", "end", "priority", "left", "right", "size")
+
+    def __init__(self, lines: List[str], start: int, end: int, priority: Optional[float] = None):
+        self.lines = lines
+        self.start = start
+        self.end = end
+        self.priority = random.random() if priority is None else priority
+        self.left = None
+        self.right = None
+        self.size = end - start
+
+
+def _size(node: Optional[_Piece]) -> int:
+    return node.size if node else 0
+
+
+def _update(node: _Piece) -> _Piece:
+    node.size = (node.end - node.start) + _size(node.left) + _size(node.right)
+    return node
+
+
+def _split(node: Optional[_Piece], index: int) -> Tuple[Optional[_Piece], Optional[_Piece]]:
+    """Split a treap into its first `index` lines and the rest, cutting a piece if needed."""
+    if node is None:
+        return None, None
+    left_size = _size(node.left)
+    length = node.end - node.start
+    if index <= left_size:
+        left, node.left = _split(node.left, index)
+        return left, _update(node)
+    if index >= left_size + length:
+        node.right, right = _split(node.right, index - left_size - length)
+        return _update(node), right
+
+    # The cut falls inside this piece: keep the head here, move the tail to a new node
+    offset = node.start + index - left_size
+    tail = _Piece(node.lines, offset, node.end, node.priority)
+    tail.right = node.right
+    node.end = offset
+    node.right = None
+    return _update(node), _update(tail)
+
+
+def _merge(left: Optional[_Piece], right: Optional[_Piece]) -> Optional[_Piece]:
+    if left is None or right is None:
+        return left or right
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        return _update(left)
+    right.left = _merge(left, right.left)
+    return _update(right)
+
+
+class LineRope:
+    """
+    A sequence of lines built by inserting blocks, stored as a piece table in a treap.
+
+    Inserting a block and reading a line are O(log n) in the number of pieces, and
+    the lines are only copied once, when the final text is joined.
+    """
+
+    def __init__(self):
+        self.root = None
+
+    def __len__(self) -> int:
+        return _size(self.root)
+
+    def insert(self, index: int, lines: List[str]):
+        """Insert lines before `index`, clamping it like a list slice does."""
+        if not lines:
+            return
+        if index < 0:
+            index = max(0, len(self) + index)
+        left, right = _split(self.root, min(index, len(self)))
+        self.root = _merge(_merge(left, _Piece(lines, 0, len(lines))), right)
+
+    def __getitem__(self, index: int) -> str:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("line index out of range")
+        node = self.root
+        while True:
+            left_size = _size(node.left)
+            if index < left_size:
+                node = node.left
+                continue
+            index -= left_size
+            if index < node.end - node.start:
+                return node.lines[node.start + index]
+            index -= node.end - node.start
+            node = node.right
+
+    def __iter__(self) -> Iterator[str]:
+        stack = []
+        node = self.root
+        while stack or node:
+            while node:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield from node.lines[node.start:node.end]
+            node = node.right
+
+    def join(self) -> str:
+        return ''.join(self)
+
+
+LINE_COMMENT_PATTERN = re.compile(r'//.*$')
+OPENING_BRACKETS = '{(['
+CLOSING_BRACKETS = '})]'
+# Escapes are matched as a unit so an escaped quote never ends a string
+BRACKET_TOKEN_PATTERN = re.compile(r"""\\.|//|/\*|\*/|[{}()\[\]'"`]""")
+
+
+def normalize_line(line: str) -> str:
+    """Strip line comments and surrounding whitespace, for comparing lines across files."""
+    return LINE_COMMENT_PATTERN.sub('', line).strip()
+
+
+def bracket_depths(lines: List[str]) -> List[Tuple[int, int, int, int, bool]]:
+    """
+    Return (lowest depth, highest depth after the lowest, highest depth, depth at end,
+    whether a curly brace opens) for every line.
+
+    Brackets inside strings, template literals and comments are ignored. Single- and
+    double-quoted strings end at the end of the line, so stray apostrophes in JSX
+    text cannot swallow the rest of the file.
+    """
+    depths = []
+    depth = 0
+    in_block_comment = False
+    in_template = False
+    for line in lines:
+        low = rise = peak = depth
+        opens_brace = False
+        quote = None
+        for token in BRACKET_TOKEN_PATTERN.finditer(line):
+            char = token.group()
+            if in_block_comment:
+                if char == '*/':
+                    in_block_comment = False
+            elif in_template or quote:
+                if char == '`' and in_template:
+                    in_template = False
+                elif char == quote:
+                    quote = None
+            elif char == '//':
+                break
+            elif char == '/*':
+                in_block_comment = True
+            elif char in ('\'', '"'):
+                quote = char
+            elif char == '`':
+                in_template = True
+            elif char in OPENING_BRACKETS:
+                opens_brace = opens_brace or char == '{'
+                depth += 1
+                peak = max(peak, depth)
+                rise = max(rise, depth)
+            elif char in CLOSING_BRACKETS:
+                depth -= 1
+                if depth < low:
+                    low = rise = depth
+        depths.append((low, rise, peak, depth, opens_brace))
+    return depths
+
+
+def block_ends(lines: List[str]) -> List[int]:
+    """
+    For every line, the exclusive end of the block it opens, or -1 if it never closes.
+
+    The block opened by line i is measured from the lowest depth on that line, so
+    `} else {` opens the else block. It ends at the first line j >= i after which
+    the depth is back at or below that base, having gone above it first. A line that
+    only closes brackets is a block by itself. A line that opens no brace, or only
+    parentheses and square brackets that close on the same line (e.g. `function c()`),
+    waits for the next line to open one (a brace on its own line), or ends where its
+    enclosing block closes.
+
+    Computed for all lines in one pass: starts waiting to open are kept in a deque
+    (newest has the lowest base depth), opened starts in a heap by base depth.
+    """
+    ends = [-1] * len(lines)
+    waiting = deque()
+    opened = []
+    depth = 0
+    for j, (low, rise, peak, end_depth, opens_brace) in enumerate(bracket_depths(lines)):
+        while waiting and waiting[-1][0] < peak:
+            base, start = waiting.pop()
+            heapq.heappush(opened, (-base, start))
+        while waiting and waiting[0][0] > end_depth:
+            _, start = waiting.popleft()
+            ends[start] = j + 1
+        if rise > low and (end_depth > low or opens_brace):
+            heapq.heappush(opened, (-low, j))
+        elif low < depth:
+            ends[j] = j + 1
+        else:
+            waiting.append((low, j))
+        while opened and -opened[0][0] >= end_depth:
+            _, start = heapq.heappop(opened)
+            ends[start] = j + 1
+        depth = end_depth
+    return ends
+
+
+class SourceIndex:
+    """
+    Lookup tables over the lines of a source file: normalized line to line numbers,
+    and the end of the block each line opens. Built once and shared by every
+    transformation that uses the same source file.
+    """
+
+    def __init__(self, lines: List[str]):
+        self.line_numbers: Dict[str, List[int]] = {}
+        for i, line in enumerate(lines):
+            self.line_numbers.setdefault(normalize_line(line), []).append(i)
+        self.block_ends = block_ends(lines)
+
+    def find_block(self, line: str, start_idx: int) -> Tuple[int, int]:
+        """Return (start, end) of the block opened by the first line at or after start_idx matching `line`."""
+        candidates = self.line_numbers.get(normalize_line(line))
+        if not candidates:
+            return -1, -1
+        position = bisect_left(candidates, start_idx)
+        if position == len(candidates):
+            return -1, -1
+        start = candidates[position]
+        end = self.block_ends[start]
+        return (start, end) if end != -1 else (-1, -1)
+
+
+_source_indexes: Dict[Tuple[str, int, int], SourceIndex] = {}
+
+
+def get_source_index(path: str, lines: List[str]) -> SourceIndex:
+    """Return the SourceIndex for a file, reusing it while the file's mtime and size are unchanged."""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    index = _source_indexes.get(key)
+    if index is None:
+        index = _source_indexes[key] = SourceIndex(lines)
+    return index
+
+
+# A keep phrase names the code it stands for ("Rest of the component remains the same",
+# "All other functions and JSX remain unchanged"), so ordinary comments such as
+# "Modal remains open until the user saves" are not taken for markers
+KEEP_MARKER_PATTERN = re.compile(
+    r'\b(?:rest of|existing|other|previous|this|these|all)\b.*?'
+    r'\b(?:code|functions?|components?|jsx|methods?|logic|implementation|file|imports|styles)\b.*?'
+    r'(?:\b(?:remains?|stays?|is|are|kept)\s+(?:the\s+same|unchanged|as\s+(?:is|before))\b|\bunchanged\b)',
+    re.IGNORECASE
+)
+# Bare placeholders like "// ... existing code ..." or "{/* rest of the component */}"
+KEEP_PLACEHOLDER_PATTERN = re.compile(
+    r'(?:\.\.\.\s*)?(?:rest of (?:the )?|existing |unchanged )(?:code|file|component|jsx|functions|implementation)\W*',
+    re.IGNORECASE
+)
+
+
+class LocalTransformError(Exception):
+    """Raised when the local engine cannot tell which source lines a marker refers to."""
+
+
+def is_keep_marker(line: str) -> bool:
+    """True for comments like "// this function should remain the same" or "{/* Existing JSX unchanged */}"."""
+    stripped = line.strip().lstrip('{').strip()
+    if not stripped.startswith(('//', '/*', '*')):
+        return False
+    text = stripped.rstrip('}').rstrip().removesuffix('*/').lstrip('/*').strip()
+    return KEEP_MARKER_PATTERN.search(text) is not None or KEEP_PLACEHOLDER_PATTERN.fullmatch(text) is not None
+
+
+def _patience_matches(a: List[str], alo: int, ahi: int, b: List[str], blo: int, bhi: int,
+                      matches: List[Tuple[int, int]]):
+    """Append the matched (a index, b index) pairs of a[alo:ahi] and b[blo:bhi] to matches, in order."""
+    while alo < ahi and blo < bhi and a[alo] == b[blo]:
+        matches.append((alo, blo))
+        alo += 1
+        blo += 1
+    suffix = []
+    while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+        ahi -= 1
+        bhi -= 1
+        suffix.append((ahi, bhi))
+
+    if alo < ahi and blo < bhi:
+        # Anchor on lines that occur exactly once on both sides, keeping the longest
+        # run of them that appears in the same order (patience sorting)
+        counts_a = Counter(a[alo:ahi])
+        counts_b = Counter(b[blo:bhi])
+        positions_b = {b[j]: j for j in range(blo, bhi) if counts_b[b[j]] == 1}
+        pairs = [(i, positions_b[a[i]]) for i in range(alo, ahi)
+                 if counts_a[a[i]] == 1 and a[i] in positions_b]
+
+        tails: List[int] = []
+        tail_pairs: List[int] = []
+        previous: List[int] = []
+        for k, (_, j) in enumerate(pairs):
+            position = bisect_left(tails, j)
+            if position == len(tails):
+                tails.append(j)
+                tail_pairs.append(k)
+            else:
+                tails[position] = j
+                tail_pairs[position] = k
+            previous.append(tail_pairs[position - 1] if position else -1)
+        anchors = []
+        k = tail_pairs[-1] if tail_pairs else -1
+        while k != -1:
+            anchors.append(pairs[k])
+            k = previous[k]
+        anchors.reverse()
+
+        if anchors:
+            for i, j in anchors:
+                _patience_matches(a, alo, i, b, blo, j, matches)
+                matches.append((i, j))
+                alo, blo = i + 1, j + 1
+            _patience_matches(a, alo, ahi, b, blo, bhi, matches)
+        else:
+            # No unique lines to anchor on: fall back to difflib's longest-match diff
+            matcher = difflib.SequenceMatcher(None, a[alo:ahi], b[blo:bhi], autojunk=False)
+            for i, j, size in matcher.get_matching_blocks():
+                matches.extend((alo + i + k, blo + j + k) for k in range(size))
+
+    matches.extend(reversed(suffix))
+
+
+def patience_diff(a: List[str], b: List[str]) -> Dict[int, int]:
+    """
+    Line-level patience diff of a and b, compared with trailing whitespace stripped.
+
+    Returns `{b index: a index}` for every line of b that matches a line of a.
+    """
+    a_keys = [line.rstrip() for line in a]
+    b_keys = [line.rstrip() for line in b]
+    matches: List[Tuple[int, int]] = []
+    _patience_matches(a_keys, 0, len(a_keys), b_keys, 0, len(b_keys), matches)
+    return {j: i for i, j in matches}
+
+
 class CodeTransformer:
-    def __init__(self, source_path: str, target_path: str):
+    def __init__(self, source_path: str, target_path: str, verbose: bool = True):
         self.source_path = source_path
         self.target_path = target_path
+        self.verbose = verbose
+        self.engine = None
         self.source_lines = []
         self.target_lines = []
+        self._source_index = None
         self.load_files()
 
+    def log(self, message: str):
+        """Print progress output, unless the transformer is running quietly (e.g. in batch mode)."""
+        if self.verbose:
+            print(message)
+
     def load_files(self):
         """Load source and target files with line numbers."""
         with open(self.source_path, 'r') as f:
@@ -55,25 +420,16 @@ class CodeTransformer:
 
         return adjusted_lines
 
+    @property
+    def source_index(self) -> SourceIndex:
+        """Index over the source lines, shared with other transformers of the same source file."""
+        if self._source_index is None:
+            self._source_index = get_source_index(self.source_path, self.source_lines)
+        return self._source_index
+
     def find_matching_source_block(self, target_line: str, start_idx: int) -> Tuple[int, int]:
         """Find the corresponding block in source file."""
-        # Remove comments and whitespace for comparison
-        clean_line = re.sub(r'//.*$', '', target_line).strip()
-        
-        # Look for matching line in source
-        for i, source_line in enumerate(self.source_lines[start_idx:], start_idx):
-            if re.sub(r'//.*$', '', source_line).strip() == clean_line:
-                # Found matching start, now find the block end
-                block_level = 0
-                for j, line in enumerate(self.source_lines[i:], i):
-                    if '{' in line:
-                        block_level += 1
-                    if '}' in line:
-                        block_level -= 1
-                        if block_level == 0:
-                            return i, j + 1
-                break
-        return -1, -1
+        return self.source_index.find_block(target_line, start_idx)
 
     def generate_llm_prompt(self) -> str:
         """Generate the prompt for the LLM."""
@@ -142,76 +498,183 @@ Return only a valid JSON object with the operations array. Example:
 """
         return prompt
 
-    def _execute_single_operation(self, operation: Dict, current_lines: List[str]) -> List[str]:
+    def _execute_single_operation(self, operation: Dict, current_lines: LineRope):
         """Execute a single operation while maintaining proper indentation."""
         op_type = operation['operation']
-        
+
         if op_type == 'COPY_FROM_SOURCE':
-            start = operation['start_line'] - 1
-            end = operation['end_line']
-            target = operation['target_line']
-            content = self.source_lines[start:end]
-            
-            # Get target indentation if there are existing lines
-            target_indent = 0
-            if current_lines and target < len(current_lines):
-                target_indent = self.get_indent_level(current_lines[target])
-            
-            content = self.adjust_indentation(content, target_indent)
-            return current_lines[:target] + content + current_lines[target:]
-            
+            lines = self.source_lines
         elif op_type == 'COPY_FROM_TARGET':
-            start = operation['start_line'] - 1
-            end = operation['end_line']
-            target = operation['target_line']
-            content = self.target_lines[start:end]
-            
-            # Get target indentation if there are existing lines
-            target_indent = 0
-            if current_lines and target < len(current_lines):
-                target_indent = self.get_indent_level(current_lines[target])
-            
-            content = self.adjust_indentation(content, target_indent)
-            return current_lines[:target] + content + current_lines[target:]
-            
+            lines = self.target_lines
         else:
             raise ValueError(f"Unknown operation type: {op_type}")
 
+        start = operation['start_line'] - 1
+        end = operation['end_line']
+        target = operation['target_line']
+        content = lines[start:end]
+
+        # Get target indentation if there are existing lines
+        target_indent = 0
+        if len(current_lines) and target < len(current_lines):
+            target_indent = self.get_indent_level(current_lines[target])
+
+        if operation.get('adjust_indentation', True):
+            content = self.adjust_indentation(content, target_indent)
+        current_lines.insert(target, content)
+
     def execute_operations(self, operations_json: str) -> str:
         """Execute a sequence of operations."""
         try:
-            print("\nExecuting transformation operations...")
+            self.log("\nExecuting transformation operations...")
             data = json.loads(operations_json)
             operations = data['operations']
             
-            current_lines = []
+            current_lines = LineRope()
             
             for i, op in enumerate(operations, 1):
-                print(f"\nOperation {i}:")
-                print(json.dumps(op, indent=2))
+                self.log(f"\nOperation {i}:")
+                self.log(json.dumps(op, indent=2))
                 
                 try:
-                    current_lines = self._execute_single_operation(op, current_lines)
-                    if current_lines is None:
-                        raise ValueError("Operation returned None")
-                    print(f"Operation {i} completed successfully")
+                    self._execute_single_operation(op, current_lines)
+                    self.log(f"Operation {i} completed successfully")
                 except Exception as e:
                     print(f"Error executing operation {i}: {e}")
                     continue
 
-            return ''.join(current_lines)
+            return current_lines.join()
             
         except json.JSONDecodeError as e:
             raise ValueError(f"Invalid JSON format: {e}")
         except KeyError as e:
             raise ValueError(f"Missing required field: {e}")
 
-    def process_with_anthropic(self, api_key: str) -> str:
-        """Process the files using Anthropic's API."""
-        client = Anthropic(api_key=api_key)
+    def _resolve_marker_block(self, target_idx: int, source_cursor: int, matched: Dict[int, int]) -> Tuple[int, int]:
+        """Find the source block a target marker block stands for, preferring one with the same indentation."""
+        if target_idx in matched:
+            start = matched[target_idx]
+            end = self.source_index.block_ends[start]
+            if end != -1:
+                return start, end
+
+        line = self.target_lines[target_idx]
+        indent = self.get_indent_level(line)
+        first = (-1, -1)
+        start_idx = source_cursor
+        while True:
+            start, end = self.find_matching_source_block(line, start_idx)
+            if start == -1:
+                return first
+            if self.get_indent_level(self.source_lines[start]) == indent:
+                return start, end
+            if first[0] == -1:
+                first = (start, end)
+            start_idx = start + 1
+
+    def generate_local_operations(self) -> List[Dict]:
+        """
+        Work out the operations locally, without the LLM.
+
+        Target lines are copied as they are, except keep-markers. A target block whose
+        body holds only markers (e.g. `return ( // Existing JSX remains the same... );`)
+        is replaced by the matching source block. Any other run of markers stands for
+        the source lines between the source lines matched just before and after it, and
+        is kept as it is when that range is empty. Raises LocalTransformError when that cannot be decided.
+        """
+        source = self.source_lines
+        target = self.target_lines
+        matched = patience_diff(source, target)
+        target_ends = block_ends(target)
+
+        def is_filler(j: int) -> bool:
+            return not target[j].strip() or is_keep_marker(target[j])
+
+        marker_blocks: Dict[int, int] = {}
+        for j, end in enumerate(target_ends):
+            body = range(j + 1, end - 1)
+            if end - j >= 3 and all(is_filler(k) for k in body) and any(is_keep_marker(target[k]) for k in body):
+                marker_blocks[j] = end
+
+        operations: List[Dict] = []
+        output_size = 0
+
+        def emit(op_type: str, start: int, end: int):
+            nonlocal output_size
+            if start >= end:
+                return
+            last = operations[-1] if operations else None
+            if last and last['operation'] == op_type and last['end_line'] == start:
+                last['end_line'] = end
+            else:
+                operations.append({
+                    "operation": op_type,
+                    "start_line": start + 1,
+                    "end_line": end,
+                    "target_line": output_size,
+                    "adjust_indentation": False,
+                })
+            output_size += end - start
+
+        source_cursor = 0
+        j = 0
+        while j < len(target):
+            if j in marker_blocks:
+                start, end = self._resolve_marker_block(j, source_cursor, matched)
+                if start == -1:
+                    raise LocalTransformError(f"No source block matches target line {j + 1}: {target[j].strip()}")
+                emit('COPY_FROM_SOURCE', start, end)
+                source_cursor = end
+                j = marker_blocks[j]
+            elif is_keep_marker(target[j]):
+                run_end = j
+                while run_end < len(target) and is_filler(run_end) and run_end not in marker_blocks:
+                    run_end += 1
+                # The markers stand for everything up to the next target line anchored in the source
+                next_source = len(source)
+                for k in range(run_end, len(target)):
+                    if k in marker_blocks:
+                        next_source = self._resolve_marker_block(k, source_cursor, matched)[0]
+                        break
+                    if k in matched:
+                        next_source = matched[k]
+                        break
+                if next_source < source_cursor:
+                    raise LocalTransformError(f"Marker at target line {j + 1} does not follow the source order")
+                if next_source == source_cursor:
+                    # Nothing left to stand for: keep the comment rather than dropping it
+                    emit('COPY_FROM_TARGET', j, run_end)
+                emit('COPY_FROM_SOURCE', source_cursor, next_source)
+                source_cursor = next_source
+                j = run_end
+            else:
+                emit('COPY_FROM_TARGET', j, j + 1)
+                if j in matched:
+                    source_cursor = max(source_cursor, matched[j] + 1)
+                j += 1
+        return operations
+
+    def process(self, api_key: Optional[str] = None, client: Optional[Anthropic] = None) -> str:
+        """Transform locally, falling back to Anthropic's API when the markers are ambiguous."""
+        try:
+            operations = self.generate_local_operations()
+        except LocalTransformError as e:
+            if not api_key and client is None:
+                raise ValueError(f"{e}; set ANTHROPIC_API_KEY to fall back to the LLM")
+            self.log(f"Local transform failed ({e}), falling back to Anthropic")
+            self.engine = 'anthropic'
+            return self.process_with_anthropic(api_key, client=client)
+        self.log(f"Generated {len(operations)} operations locally")
+        self.engine = 'local'
+        return self.execute_operations(json.dumps({"operations": operations}))
+
+    def process_with_anthropic(self, api_key: str, client: Optional[Anthropic] = None) -> str:
+        """Process the files using Anthropic's API. Pass `client` to share one client across transformers."""
+        if client is None:
+            client = Anthropic(api_key=api_key)
         
         prompt = self.generate_llm_prompt()
-        print("Sending prompt to Anthropic...")
+        self.log("Sending prompt to Anthropic...")
         
         message = client.messages.create(
             model="claude-3-5-sonnet-20241022",
@@ -222,32 +685,219 @@ Return only a valid JSON object with the operations array. Example:
             }]
         )
         
-        print("Received response from Anthropic")
-        print(message.content[0].text)
+        self.log("Received response from Anthropic")
+        self.log(message.content[0].text)
         
         try:
-            print("Processing LLM response...")
+            self.log("Processing LLM response...")
             operations_json = message.content[0].text
             result = self.execute_operations(operations_json)
             return result
         except Exception as e:
             raise Exception(f"Error processing LLM response: {e}")
 
+DEFAULT_WORKERS = 4
+BATCH_STATE_FILE = os.path.join('.scalez_cache', 'modify_files_state.json')
+MANIFEST_FIELDS = ('source', 'target', 'output')
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file's bytes."""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_manifest(manifest_path: str) -> List[Dict[str, str]]:
+    """
+    Read a manifest: a JSON list of {"source": ..., "target": ..., "output": ...} entries.
+    Relative paths are resolved against the manifest's directory.
+    """
+    with open(manifest_path, 'r') as f:
+        entries = json.load(f)
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    pairs = []
+    for i, entry in enumerate(entries, 1):
+        missing = [field for field in MANIFEST_FIELDS if field not in entry]
+        if missing:
+            raise ValueError(f"Manifest entry {i} is missing: {', '.join(missing)}")
+        pairs.append({field: os.path.join(base, entry[field]) for field in MANIFEST_FIELDS})
+    return pairs
+
+
+def load_batch_state(state_path: str) -> Dict[str, Dict]:
+    """Load the input and output digests recorded by the last batch run, keyed by output path."""
+    try:
+        with open(state_path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_batch_state(state: Dict[str, Dict], state_path: str):
+    """Write the batch state atomically, so an interrupted run never leaves a truncated file."""
+    directory = os.path.dirname(state_path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(state, f, indent=2)
+        os.replace(temp_path, state_path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def transform_pair(pair: Dict[str, str], previous: Optional[Dict], api_key: Optional[str],
+                   client: Optional[Anthropic], force: bool = False, engine: Optional[str] = None) -> Dict:
+    """
+    Transform one source/target pair and write its output.
+
+    The pair is skipped when its inputs have the digests recorded in `previous` and the
+    output is still the file that run wrote. With engine='local' the LLM is never called
+    and a pair the local engine cannot resolve is returned as 'pending'; with
+    engine='anthropic' the local engine is not tried. Errors are reported in the
+    result, not raised.
+    """
+    start_time = time.perf_counter()
+    result = dict(pair, status=None, engine=None)
+    transformer = None
+    try:
+        inputs = {'source': file_digest(pair['source']), 'target': file_digest(pair['target'])}
+        if (not force and previous and previous.get('inputs') == inputs
+                and os.path.exists(pair['output']) and file_digest(pair['output']) == previous.get('output')):
+            result['status'] = 'skipped'
+        else:
+            transformer = CodeTransformer(pair['source'], pair['target'], verbose=False)
+            if engine == 'local':
+                transformer.engine = 'local'
+                output = transformer.execute_operations(json.dumps({"operations": transformer.generate_local_operations()}))
+            elif engine == 'anthropic':
+                transformer.engine = 'anthropic'
+                if not api_key and client is None:
+                    raise ValueError("set ANTHROPIC_API_KEY to fall back to the LLM")
+                output = transformer.process_with_anthropic(api_key, client=client)
+            else:
+                output = transformer.process(api_key, client=client)
+            os.makedirs(os.path.dirname(pair['output']) or '.', exist_ok=True)
+            with open(pair['output'], 'w') as f:
+                f.write(output)
+            result['status'] = 'transformed'
+            result['engine'] = transformer.engine
+            result['lines'] = len(output.splitlines())
+            result['state'] = {'inputs': inputs, 'output': file_digest(pair['output'])}
+    except LocalTransformError as e:
+        result['status'] = 'pending'
+        result['error'] = str(e)
+    except Exception as e:
+        result['status'] = 'failed'
+        result['engine'] = transformer.engine if transformer else None
+        result['error'] = str(e)
+    result['seconds'] = round(time.perf_counter() - start_time, 3)
+    return result
+
+
+def transform_pair_locally(pair: Dict[str, str], previous: Optional[Dict], force: bool = False) -> Dict:
+    """transform_pair without the LLM, for the process pool (an Anthropic client cannot be pickled)."""
+    return transform_pair(pair, previous, None, None, force, engine='local')
+
+
+def run_batch(manifest_path: str, api_key: Optional[str] = None, workers: int = DEFAULT_WORKERS,
+              force: bool = False, state_path: str = BATCH_STATE_FILE) -> Dict:
+    """
+    Transform every pair of a manifest with bounded pools of workers and return a summary.
+
+    The local engine is pure Python and CPU-bound, so threads would only take turns
+    holding the GIL: local transforms run in a process pool instead, with at most
+    one process per core, which gives no speedup on a single core. Pairs it cannot
+    resolve then go to Anthropic from a thread pool sharing one client, as those calls
+    spend their time waiting on the network. Pairs whose inputs are unchanged since
+    the last run are skipped.
+    """
+    start_time = time.perf_counter()
+    pairs = load_manifest(manifest_path)
+    state = load_batch_state(state_path)
+    previous = [state.get(pair['output']) for pair in pairs]
+    workers = max(1, workers)
+    # More processes than cores only adds start-up and pickling overhead
+    processes = min(workers, len(pairs), os.cpu_count() or 1)
+
+    if processes <= 1:
+        results = list(map(transform_pair_locally, pairs, previous, [force] * len(pairs)))
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = list(executor.map(transform_pair_locally, pairs, previous, [force] * len(pairs)))
+
+    pending = [i for i, result in enumerate(results) if result['status'] == 'pending']
+    if pending:
+        client = Anthropic(api_key=api_key) if api_key else None
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            fallbacks = list(executor.map(
+                lambda i: transform_pair(pairs[i], previous[i], api_key, client, force, engine='anthropic'),
+                pending,
+            ))
+        for i, fallback in zip(pending, fallbacks):
+            fallback['seconds'] = round(fallback['seconds'] + results[i]['seconds'], 3)
+            # Keep why the local engine gave up, which the fallback's own error would hide
+            fallback['local_error'] = results[i]['error']
+            if fallback['status'] == 'failed':
+                fallback['error'] = f"{results[i]['error']}; {fallback['error']}"
+            results[i] = fallback
+
+    for result in results:
+        pair_state = result.pop('state', None)
+        if pair_state is not None:
+            state[result['output']] = pair_state
+    save_batch_state(state, state_path)
+
+    summary = {'manifest': manifest_path, 'pairs': len(results)}
+    for status in ('transformed', 'skipped', 'failed'):
+        summary[status] = sum(1 for result in results if result['status'] == status)
+    summary['llm_fallbacks'] = sum(1 for result in results if result['engine'] == 'anthropic')
+    summary['wall_seconds'] = round(time.perf_counter() - start_time, 3)
+    summary['results'] = results
+    return summary
+
+
+def print_batch_summary(summary: Dict):
+    """Print one line per pair and the totals of a batch run."""
+    for result in summary['results']:
+        detail = result.get('error') or result['engine'] or ''
+        print(f"{result['status']:<12} {result['output']} {detail} ({result['seconds']:.3f}s)")
+    print(f"\n{summary['pairs']} pairs: {summary['transformed']} transformed, {summary['skipped']} skipped, "
+          f"{summary['failed']} failed, {summary['llm_fallbacks']} LLM fallbacks in {summary['wall_seconds']:.3f}s")
+
+
 def main():
+    parser = argparse.ArgumentParser(description='Merge target files into their source files.')
+    parser.add_argument('--manifest', help='JSON list of {"source", "target", "output"} entries to transform in one batch')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help=f'Processes for local transforms (capped at the core count) and threads for LLM fallbacks (default: {DEFAULT_WORKERS})')
+    parser.add_argument('--report', help='Where to write the batch summary (default: <manifest>.report.json)')
+    parser.add_argument('--force', action='store_true', help='Transform every pair, even if its inputs are unchanged')
+    args = parser.parse_args()
+
+    # The API key is only needed when the local transform falls back to the LLM
+    api_key = os.getenv('ANTHROPIC_API_KEY')
+
+    if args.manifest:
+        summary = run_batch(args.manifest, api_key, workers=args.workers, force=args.force)
+        report_path = args.report or os.path.splitext(args.manifest)[0] + '.report.json'
+        with open(report_path, 'w') as f:
+            json.dump(summary, f, indent=2)
+        print_batch_summary(summary)
+        print(f"Report saved to {report_path}")
+        if summary['failed']:
+            raise SystemExit(1)
+        return
+
     # Ensure data directory exists
     os.makedirs('data', exist_ok=True)
 
     # Initialize transformer
     transformer = CodeTransformer('data/source.txt', 'data/target.txt')
     
-    # Get API key from environment
-    api_key = os.getenv('ANTHROPIC_API_KEY')
-    if not api_key:
-        raise ValueError("ANTHROPIC_API_KEY environment variable is required")
-    
     try:
         # Process the files
-        result = transformer.process_with_anthropic(api_key)
+        result = transformer.process(api_key)
         
         # Save result
         with open('data/output.txt', 'w') as f:
@@ -1,10 +1,23 @@
 import os
+import re
+import time
 import requests
 import json
+import argparse
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 
 # Set up Twilio credentials (replace with your actual credentials)
 TWILIO_ACCOUNT_SID = os.getenv('TWILIO_ACCOUNT_SID', 'your_account_sid')
 TWILIO_AUTH_TOKEN = os.getenv('TWILIO_AUTH_TOKEN', 'your_auth_token')
+# Overridable so provisioning can run against a local fake of the Content API
+CONTENT_API_URL = os.getenv('TWILIO_CONTENT_API_URL', 'https://content.twilio.com/v1')
+
+DEFAULT_CONCURRENCY = 4
+MAX_RETRIES = 5
+RETRY_BASE_DELAY = 1.0
 
 # Function to create the list picker template dynamically
 def create_dynamic_list_picker_template(item_count):
@@ -89,42 +102,232 @@ def create_quick_reply_template(item_count):
     }
     return template
 
+def create_session(pool_size=DEFAULT_CONCURRENCY):
+    """Create a session that reuses connections to the Content API, one per concurrent worker."""
+    session = requests.Session()
+    session.auth = (TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def parse_retry_after(retry_after):
+    """Seconds to wait from a Retry-After header, given in seconds or as an HTTP date. None if unusable."""
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def request_with_retry(session, method, url, max_retries=MAX_RETRIES, base_delay=RETRY_BASE_DELAY, **kwargs):
+    """Send a request, retrying on 429 with exponential backoff or the server's Retry-After."""
+    for attempt in range(max_retries + 1):
+        response = session.request(method, url, **kwargs)
+        if response.status_code != 429 or attempt == max_retries:
+            return response
+        delay = parse_retry_after(response.headers.get('Retry-After'))
+        if delay is None:
+            delay = base_delay * (2 ** attempt)
+        print(f"Rate limited, retrying in {delay:.1f}s ({attempt + 1}/{max_retries})")
+        time.sleep(delay)
+
+
+def list_existing_templates(session, base_url=CONTENT_API_URL):
+    """Fetch every existing template once, following pagination, and return `{friendly_name: sid}`."""
+    templates = {}
+    url = f"{base_url}/Content"
+    params = {'PageSize': 1000}
+    while url:
+        response = request_with_retry(session, 'GET', url, params=params)
+        response.raise_for_status()
+        page = response.json()
+        for content in page.get('contents', []):
+            templates[content['friendly_name']] = content['sid']
+        url = page.get('meta', {}).get('next_page_url')
+        # The next page URL already carries the paging parameters
+        params = None
+    return templates
+
+
+TEMPLATE_FACTORIES = {
+    'quick-reply': create_quick_reply_template,
+    'list-picker': create_dynamic_list_picker_template,
+}
+MAX_ITEM_COUNT = 10
+VARIABLE_PATTERN = re.compile(r'^item(\d+)_(\w+)$')
+
+
+class TemplateRegistry:
+    """
+    Every variant (1 to 10 items) of every template type, generated once.
+
+    Alongside each template the registry keeps the (variable, item index, field)
+    slots it needs, so rendering the variables of an outgoing message is a
+    single lookup per slot. Cached templates are shared; do not modify them.
+    """
+
+    def __init__(self, factories=TEMPLATE_FACTORIES, max_item_count=MAX_ITEM_COUNT):
+        self._templates = {}
+        self._slots = {}
+        for template_type, factory in factories.items():
+            for item_count in range(1, max_item_count + 1):
+                template = factory(item_count)
+                slots = []
+                for variable in template['variables']:
+                    index, field = VARIABLE_PATTERN.match(variable).groups()
+                    slots.append((variable, int(index) - 1, field))
+                self._templates[(template_type, item_count)] = template
+                self._slots[(template_type, item_count)] = slots
+
+    def get(self, template_type, item_count):
+        """Return the cached template for a type and item count."""
+        try:
+            return self._templates[(template_type, item_count)]
+        except KeyError:
+            raise ValueError(f"No {template_type} template with {item_count} items") from None
+
+    def templates(self, template_types=None, max_item_count=MAX_ITEM_COUNT):
+        """Return the templates of the given types (all by default) with 1 to max_item_count items."""
+        return [
+            template for (template_type, item_count), template in self._templates.items()
+            if (template_types is None or template_type in template_types) and item_count <= max_item_count
+        ]
+
+    def render(self, template_type, items):
+        """
+        Fill the variables of the template matching len(items) for an outgoing message.
+
+        Each item is a dict keyed by field, e.g. {"name", "id", "description"} for a
+        list picker or {"title", "id"} for quick replies; missing fields keep the
+        template's default. Returns (friendly_name, content variables).
+        """
+        key = (template_type, len(items))
+        template = self.get(*key)
+        defaults = template['variables']
+        variables = {
+            variable: str(items[index].get(field, defaults[variable]))
+            for variable, index, field in self._slots[key]
+        }
+        return template['friendly_name'], variables
+
+    def render_content_variables(self, template_type, items):
+        """Like `render`, with the variables serialized as the ContentVariables JSON Twilio expects."""
+        friendly_name, variables = self.render(template_type, items)
+        return friendly_name, json.dumps(variables)
+
+    def to_manifest(self):
+        """Return all templates as a JSON-serializable manifest, keyed by type."""
+        manifest = {}
+        for (template_type, item_count), template in self._templates.items():
+            manifest.setdefault(template_type, {})[str(item_count)] = template
+        return manifest
+
+    def save_manifest(self, path):
+        """Write the manifest of all templates to a JSON file."""
+        with open(path, 'w') as f:
+            json.dump(self.to_manifest(), f, indent=2)
+
+
+_registry = None
+
+
+def get_template_registry():
+    """Return the shared registry, generating it on first use."""
+    global _registry
+    if _registry is None:
+        _registry = TemplateRegistry()
+    return _registry
+
+
 # Function to send the API request
-def send_template_creation_request(template):
-    url = 'https://content.twilio.com/v1/Content'
+def send_template_creation_request(template, session=None, base_url=CONTENT_API_URL):
+    url = f"{base_url}/Content"
     headers = {
         'Content-Type': 'application/json'
     }
 
-    response = requests.post(
-        url,
-        headers=headers,
-        auth=(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN),
-        data=json.dumps(template)
-    )
-    return response
+    if session is None:
+        return requests.post(
+            url,
+            headers=headers,
+            auth=(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN),
+            data=json.dumps(template)
+        )
+    return request_with_retry(session, 'POST', url, headers=headers, data=json.dumps(template))
+
+
+def provision_templates(templates, session, base_url=CONTENT_API_URL, concurrency=DEFAULT_CONCURRENCY, dry_run=False):
+    """
+    Create the templates whose friendly_name does not exist yet, with bounded concurrency.
+
+    Returns {"existing": {name: sid}, "created": {name: sid}, "failed": {name: error}}.
+    """
+    existing_templates = list_existing_templates(session, base_url)
+    result = {'existing': {}, 'created': {}, 'failed': {}}
+    missing = []
+    for template in templates:
+        name = template['friendly_name']
+        if name in existing_templates:
+            result['existing'][name] = existing_templates[name]
+        else:
+            missing.append(template)
+    print(f"{len(templates)} templates: {len(result['existing'])} already exist, {len(missing)} to create")
+    if dry_run:
+        for template in missing:
+            print(f"Would create: {template['friendly_name']}")
+        return result
+
+    def create(template):
+        try:
+            return template['friendly_name'], send_template_creation_request(template, session, base_url)
+        except requests.RequestException as e:
+            return template['friendly_name'], e
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        for name, response in executor.map(create, missing):
+            if isinstance(response, Exception):
+                result['failed'][name] = str(response)
+            elif response.status_code == 201:
+                result['created'][name] = response.json().get('sid')
+                print(f"Template created successfully: {name} ({result['created'][name]})")
+            else:
+                result['failed'][name] = f"{response.status_code}: {response.text}"
+                print(f"Failed to create template {name}. Status Code: {response.status_code}")
+    return result
 
 
 # Main execution block
 if __name__ == "__main__":
-    try:
-        # Define the number of items (between 1 and 10)
-        item_count = 5  # Change this value as needed
-        for item_count in range(1, 10):
-        # Create template and send API request
-            template = create_quick_reply_template(item_count)
-            print("aaaaatemplate")
-            response = send_template_creation_request(template)
-            # template = create_dynamic_list_picker_template(item_count)
-            # response = send_template_creation_request(template)
-
-            if response.status_code == 201:
-                print("Template created successfully.")
-                print("Content SID:", response.json().get('sid'))
-            else:
-                print("Failed to create template.")
-                print("Status Code:", response.status_code)
-                print("Response:", response.json())
+    parser = argparse.ArgumentParser(description='Create the Twilio content templates that do not exist yet.')
+    parser.add_argument('--type', choices=sorted(TEMPLATE_FACTORIES) + ['all'], default='quick-reply', help='Template type to provision (default: quick-reply)')
+    parser.add_argument('--max-items', type=int, default=9, help='Create variants with 1 to this many items (default: 9)')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help=f'Concurrent requests (default: {DEFAULT_CONCURRENCY})')
+    parser.add_argument('--base-url', default=CONTENT_API_URL, help=f'Content API base URL (default: {CONTENT_API_URL})')
+    parser.add_argument('--dry-run', action='store_true', help='Only report which templates would be created')
+    parser.add_argument('--manifest', help='Also write every template variant to this JSON manifest')
+    args = parser.parse_args()
 
+    registry = get_template_registry()
+    if args.manifest:
+        registry.save_manifest(args.manifest)
+        print(f"Template manifest saved to {args.manifest}")
+    template_types = None if args.type == 'all' else [args.type]
+    templates = registry.templates(template_types, args.max_items)
+    try:
+        with create_session(args.concurrency) as session:
+            result = provision_templates(templates, session, args.base_url, args.concurrency, args.dry_run)
+        print(f"Created {len(result['created'])}, already existing {len(result['existing'])}, failed {len(result['failed'])}")
+        for name, error in result['failed'].items():
+            print(f"- {name}: {error}")
     except Exception as e:
-        print(f"An error occurred: {e}")
\ No newline at end of file
+        print(f"An error occurred: {e}")
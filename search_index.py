@@ -0,0 +1,183 @@
+import os
+import re
+import math
+import json
+import time
+import argparse
+from collections import Counter
+from file_cache import CACHE_DIRECTORY
+from extract_files_descriptions import extract_file_definitions, write_json_atomically
+from project_snapshot import ProjectSnapshot
+
+
+SEARCH_INDEX_FILE = os.path.join(CACHE_DIRECTORY, "search_index.json")
+# Bump when tokenization or weighting changes, so stored indexes are rebuilt
+INDEX_VERSION = 1
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Matches in definition names/descriptions and in the file path count more than in the body
+DEFINITION_WEIGHT = 3
+PATH_WEIGHT = 2
+DEFAULT_MAX_CANDIDATES = 20
+
+WORD_PATTERN = re.compile(r"[^\W\d][\w$]*")
+SUBWORD_PATTERN = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "if", "in", "is", "it", "of", "on",
+    "or", "that", "the", "this", "to", "will", "with", "all", "should", "want", "only",
+    "const", "let", "var", "function", "return", "import", "export", "default", "new", "else",
+    "true", "false", "null", "undefined", "async", "await", "class", "div", "span", "classname",
+}
+
+
+def tokenize(text):
+    """
+    Split text into lowercase search terms.
+
+    Identifiers are split on camelCase and snake_case boundaries, and a compound
+    identifier is also kept whole, so "getScaleData" yields "getscaledata", "get",
+    "scale" and "data".
+    """
+    tokens = []
+    for word in WORD_PATTERN.findall(text):
+        parts = [part.lower() for part in SUBWORD_PATTERN.findall(word) if len(part) > 1]
+        lowered = word.lower().strip("_$")
+        if len(parts) != 1 or parts[0] != lowered:
+            parts.append(lowered)
+        tokens.extend(part for part in parts if len(part) > 1 and part not in STOP_WORDS)
+    return tokens
+
+
+def document_terms(file_path, content):
+    """Weighted term frequencies of a file: its content, its definitions and its path."""
+    terms = Counter(tokenize(content))
+    for definition in extract_file_definitions(file_path, content) or []:
+        definition_text = f"{definition.get('name', '')} {definition.get('description', '')}"
+        for term in tokenize(definition_text):
+            terms[term] += DEFINITION_WEIGHT
+    for term in tokenize(file_path):
+        terms[term] += PATH_WEIGHT
+    return dict(terms)
+
+
+class SearchIndex:
+    """
+    BM25 inverted index over the project files, for ranking files against a request.
+
+    Documents are stored with the mtime and size they were indexed at, so `update`
+    only re-reads files that changed since the index was saved.
+    """
+
+    def __init__(self, documents=None):
+        self.documents = documents or {}
+        self._postings = None
+
+    @classmethod
+    def load(cls, index_file=SEARCH_INDEX_FILE):
+        """Load a saved index, or return an empty one if it is missing, unreadable or outdated."""
+        try:
+            with open(index_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls()
+        if data.get("version") != INDEX_VERSION:
+            return cls()
+        return cls(data.get("documents", {}))
+
+    def save(self, index_file=SEARCH_INDEX_FILE):
+        os.makedirs(os.path.dirname(index_file) or ".", exist_ok=True)
+        write_json_atomically({"version": INDEX_VERSION, "documents": self.documents}, index_file)
+
+    def update(self, snapshot):
+        """Bring the index in line with a project snapshot. Returns the number of files (re)indexed or removed."""
+        changes = 0
+        for file_path in list(self.documents):
+            if file_path not in snapshot.files:
+                del self.documents[file_path]
+                changes += 1
+
+        for file_path, stat_result in snapshot.files.items():
+            document = self.documents.get(file_path)
+            if document and document["mtime_ns"] == stat_result.st_mtime_ns and document["size"] == stat_result.st_size:
+                continue
+            # Not memoized: the analysis only keeps the contents of the files it sends
+            content = snapshot.read_content(file_path)
+            if content is None:
+                self.documents.pop(file_path, None)
+                continue
+            terms = document_terms(file_path, content)
+            self.documents[file_path] = {
+                "mtime_ns": stat_result.st_mtime_ns,
+                "size": stat_result.st_size,
+                "length": sum(terms.values()),
+                "terms": terms,
+            }
+            changes += 1
+
+        if changes:
+            self._postings = None
+        return changes
+
+    def postings(self):
+        """Return `{term: [(file_path, frequency), ...]}`, built from the documents on first use."""
+        if self._postings is None:
+            postings = {}
+            for file_path, document in self.documents.items():
+                for term, frequency in document["terms"].items():
+                    postings.setdefault(term, []).append((file_path, frequency))
+            self._postings = postings
+        return self._postings
+
+    def search(self, query, limit=DEFAULT_MAX_CANDIDATES):
+        """Return up to `limit` (file_path, score) pairs, best match first. Files matching no term are left out."""
+        if not self.documents:
+            return []
+        postings = self.postings()
+        document_count = len(self.documents)
+        average_length = sum(document["length"] for document in self.documents.values()) / document_count or 1
+
+        scores = Counter()
+        for term, query_frequency in Counter(tokenize(query)).items():
+            matches = postings.get(term)
+            if not matches:
+                continue
+            idf = math.log(1 + (document_count - len(matches) + 0.5) / (len(matches) + 0.5))
+            for file_path, frequency in matches:
+                length = self.documents[file_path]["length"]
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+                scores[file_path] += query_frequency * idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        return scores.most_common(limit)
+
+
+def load_search_index(snapshot, use_cache=True, index_file=SEARCH_INDEX_FILE):
+    """Load the saved index, update it for the snapshot and save it again if anything changed."""
+    index = SearchIndex.load(index_file) if use_cache else SearchIndex()
+    start_time = time.perf_counter()
+    changes = index.update(snapshot)
+    print(f"Search index: {len(index.documents)} files, {changes} updated in {(time.perf_counter() - start_time) * 1000:.1f} ms")
+    if changes and use_cache:
+        index.save(index_file)
+    return index
+
+
+def rank_files(user_request, snapshot, limit=DEFAULT_MAX_CANDIDATES, use_cache=True):
+    """Rank the snapshot's files against a request and return the best matching paths."""
+    index = load_search_index(snapshot, use_cache=use_cache)
+    start_time = time.perf_counter()
+    results = index.search(user_request, limit)
+    print(f"Ranked {len(results)} candidate files in {(time.perf_counter() - start_time) * 1000:.1f} ms:")
+    for file_path, score in results:
+        print(f"- {file_path}: {score:.2f}")
+    return [file_path for file_path, _ in results]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Rank project files against a request.')
+    parser.add_argument('query', help='Request text to rank the files against')
+    parser.add_argument('--directory', default='.', help='Project directory (default: .)')
+    parser.add_argument('--limit', type=int, default=DEFAULT_MAX_CANDIDATES, help=f'Number of files to list (default: {DEFAULT_MAX_CANDIDATES})')
+    parser.add_argument('--no-cache', action='store_true', help='Rebuild the index from scratch without saving it')
+    args = parser.parse_args()
+
+    with ProjectSnapshot(args.directory, use_cache=not args.no_cache) as snapshot:
+        rank_files(args.query, snapshot, args.limit, use_cache=not args.no_cache)
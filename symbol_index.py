@@ -0,0 +1,203 @@
+import os
+import re
+import json
+import time
+import hashlib
+import argparse
+from bisect import bisect_left
+from file_cache import CACHE_DIRECTORY
+from extract_files_descriptions import DEFINITIONS_FILE, update_project_definitions, write_json_atomically
+
+
+SYMBOL_INDEX_FILE = os.path.join(CACHE_DIRECTORY, "symbol_index.json")
+# Bump when the stored layout changes, so saved indexes are rebuilt
+SYMBOL_INDEX_VERSION = 1
+DEFAULT_LIMIT = 10
+# Fuzzy matches must share at least this fraction of their trigrams with the query
+MIN_TRIGRAM_SIMILARITY = 0.3
+# Backticked names, or words shaped like code rather than prose: containing `_` or `$`,
+# or an uppercase letter after the first (camelCase, PascalCase, UPPER_CASE)
+IDENTIFIER_PATTERN = re.compile(
+    r"`(?P<quoted>[A-Za-z_$][\w$]*)(?:\(\))?`"
+    r"|(?<![\w$])(?P<word>[\w$]*(?:[_$]|[A-Za-z$_][\w$]*?[A-Z])[\w$]*)"
+)
+
+
+def trigrams(name):
+    """Trigrams of a lowercased, padded name: "$ab" "abc" ... "yz$"."""
+    padded = f"${name.lower()}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def definitions_digest(project_definitions):
+    """Hash the definitions an index is built from, to tell when a saved index is stale."""
+    return hashlib.sha256(json.dumps(project_definitions, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class SymbolIndex:
+    """
+    Symbol table over the extracted definitions: name to the files and lines defining it.
+
+    Exact lookups are a dict access, prefix lookups a binary search over the sorted
+    lowercased names, and fuzzy lookups go through a trigram index.
+    """
+
+    def __init__(self, symbols, source_digest=None):
+        self.symbols = symbols
+        self.source_digest = source_digest
+        self.names_by_lowercase = {}
+        self.trigram_index = {}
+        for name in symbols:
+            self.names_by_lowercase.setdefault(name.lower(), []).append(name)
+            for trigram in trigrams(name):
+                self.trigram_index.setdefault(trigram, []).append(name)
+        self.sorted_lowercase = sorted(self.names_by_lowercase)
+
+    @classmethod
+    def from_definitions(cls, project_definitions):
+        """Build the index from `{file_path: [definition, ...]}` as produced by scan_project."""
+        symbols = {}
+        for file_path, definitions in project_definitions.items():
+            for definition in definitions:
+                name = definition.get("name")
+                if not name:
+                    continue
+                symbols.setdefault(name, []).append({
+                    "file": file_path,
+                    "line": definition.get("line_number"),
+                    "type": definition.get("type"),
+                })
+        return cls(symbols, definitions_digest(project_definitions))
+
+    @classmethod
+    def load(cls, index_file=SYMBOL_INDEX_FILE):
+        """Load a saved index, or return None if it is missing, unreadable or outdated."""
+        try:
+            with open(index_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != SYMBOL_INDEX_VERSION:
+            return None
+        return cls(data["symbols"], data.get("source_digest"))
+
+    def save(self, index_file=SYMBOL_INDEX_FILE):
+        os.makedirs(os.path.dirname(index_file) or ".", exist_ok=True)
+        write_json_atomically(
+            {"version": SYMBOL_INDEX_VERSION, "source_digest": self.source_digest, "symbols": self.symbols},
+            index_file,
+        )
+
+    def exact_names(self, name):
+        """Return [name] if it is a symbol, otherwise the symbols equal to it ignoring case."""
+        if name in self.symbols:
+            return [name]
+        return list(self.names_by_lowercase.get(name.lower(), []))
+
+    def lookup(self, name):
+        """Return the locations defining exactly `name`, or those of names equal to it ignoring case."""
+        return [location for match in self.exact_names(name) for location in self.symbols[match]]
+
+    def prefix(self, prefix, limit=DEFAULT_LIMIT):
+        """Return up to `limit` names starting with `prefix`, ignoring case, in alphabetical order."""
+        prefix = prefix.lower()
+        names = []
+        position = bisect_left(self.sorted_lowercase, prefix)
+        while position < len(self.sorted_lowercase) and len(names) < limit:
+            lowercase = self.sorted_lowercase[position]
+            if not lowercase.startswith(prefix):
+                break
+            names.extend(self.names_by_lowercase[lowercase])
+            position += 1
+        return names[:limit]
+
+    def fuzzy(self, query, limit=DEFAULT_LIMIT):
+        """Return up to `limit` (name, similarity) pairs for names sharing enough trigrams with `query`."""
+        query_trigrams = trigrams(query)
+        shared = {}
+        for trigram in query_trigrams:
+            for name in self.trigram_index.get(trigram, ()):
+                shared[name] = shared.get(name, 0) + 1
+        scored = []
+        for name, count in shared.items():
+            similarity = count / (len(query_trigrams) + len(trigrams(name)) - count)
+            if similarity >= MIN_TRIGRAM_SIMILARITY:
+                scored.append((name, similarity))
+        scored.sort(key=lambda item: (-item[1], item[0]))
+        return scored[:limit]
+
+    def find(self, query, limit=DEFAULT_LIMIT):
+        """Return up to `limit` matching names: the exact match, else prefix matches, else fuzzy matches."""
+        names = self.exact_names(query)
+        if names:
+            return names[:limit]
+        return self.prefix(query, limit) or [name for name, _ in self.fuzzy(query, limit)]
+
+    def files_for_request(self, text):
+        """
+        Return `{file_path: [symbol, ...]}` for the symbols named in a request.
+
+        Only identifier-shaped words count (see IDENTIFIER_PATTERN), and only when they
+        exactly name a definition. The extractor also records words from comments as
+        definitions, so plain lowercase words such as "for" or "import" are ignored;
+        backtick a lowercase name (`formatDate`, `helpers`) to look it up.
+        """
+        files = {}
+        identifiers = (match.group("quoted") or match.group("word") for match in IDENTIFIER_PATTERN.finditer(text))
+        for identifier in dict.fromkeys(identifiers):
+            # Anonymous default exports are recorded under the name "default"
+            if identifier == "default":
+                continue
+            for location in self.symbols.get(identifier, []):
+                symbols = files.setdefault(location["file"], [])
+                if identifier not in symbols:
+                    symbols.append(identifier)
+        return files
+
+
+def load_symbol_index(project_definitions, index_file=SYMBOL_INDEX_FILE):
+    """Return the saved index if it was built from these definitions, otherwise rebuild and save it."""
+    index = SymbolIndex.load(index_file)
+    if index is not None and index.source_digest == definitions_digest(project_definitions):
+        return index
+    index = SymbolIndex.from_definitions(project_definitions)
+    index.save(index_file)
+    print(f"Symbol index rebuilt: {len(index.symbols)} symbols")
+    return index
+
+
+def format_location(location):
+    return f"{location['file']}:{location['line']} ({location['type']})"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Look up where project symbols are defined.')
+    parser.add_argument('query', help='Symbol name, prefix or approximate name')
+    parser.add_argument('--mode', choices=['auto', 'exact', 'prefix', 'fuzzy'], default='auto', help='Lookup mode (default: exact, then prefix, then fuzzy)')
+    parser.add_argument('--limit', type=int, default=DEFAULT_LIMIT, help=f'Maximum number of symbols listed (default: {DEFAULT_LIMIT})')
+    parser.add_argument('--directory', default='.', help='Project directory (default: .)')
+    parser.add_argument('--refresh', action='store_true', help=f'Update {DEFINITIONS_FILE} and the index before the lookup')
+    args = parser.parse_args()
+
+    index = None if args.refresh else SymbolIndex.load()
+    if index is None:
+        index = load_symbol_index(update_project_definitions(args.directory))
+
+    start_time = time.perf_counter()
+    if args.mode == 'exact':
+        names = index.exact_names(args.query)
+    elif args.mode == 'prefix':
+        names = index.prefix(args.query, args.limit)
+    elif args.mode == 'fuzzy':
+        names = [name for name, _ in index.fuzzy(args.query, args.limit)]
+    else:
+        names = index.find(args.query, args.limit)
+    results = [(name, index.lookup(name)) for name in names]
+    elapsed = time.perf_counter() - start_time
+
+    for name, locations in results:
+        for location in locations:
+            print(f"{name}: {format_location(location)}")
+    if not results:
+        print(f"No symbol matches '{args.query}'")
+    print(f"Lookup took {elapsed * 1e6:.0f} µs")
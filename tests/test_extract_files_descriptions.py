@@ -0,0 +1,27 @@
+import os
+import json
+import stat
+
+from extract_files_descriptions import write_json_atomically
+
+
+def file_mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_new_file_gets_default_mode(tmp_path):
+    umask = os.umask(0o022)
+    try:
+        write_json_atomically({"a": 1}, str(tmp_path / "data.json"))
+    finally:
+        os.umask(umask)
+    assert file_mode(tmp_path / "data.json") == 0o644
+
+
+def test_replaced_file_keeps_its_mode(tmp_path):
+    output_file = tmp_path / "data.json"
+    output_file.write_text("{}")
+    os.chmod(output_file, 0o640)
+    write_json_atomically({"a": 1}, str(output_file))
+    assert file_mode(output_file) == 0o640
+    assert json.loads(output_file.read_text()) == {"a": 1}
@@ -0,0 +1,49 @@
+import os
+import sqlite3
+
+from file_cache import FileCache
+from file_collector import scan_files
+
+
+def test_pending_entries_are_served_before_they_are_written(tmp_path):
+    cache = FileCache(str(tmp_path))
+    cache.put("a.js", 1, 3, "abc")
+    assert cache.get("a.js", 1, 3) == "abc"
+    assert cache.get("a.js", 2, 3) is None
+    cache.close()
+
+
+def test_open_cache_does_not_lock_the_database(tmp_path):
+    cache = FileCache(str(tmp_path), flush_every=2)
+    for index in range(3):
+        cache.put(f"file{index}.js", 1, 1, "x")
+    # Another process must be able to write right away, between the cache's flushes
+    other = sqlite3.connect(cache.path, timeout=0)
+    other.execute("BEGIN IMMEDIATE")
+    other.rollback()
+    other.close()
+    cache.close()
+
+    reopened = FileCache(str(tmp_path))
+    assert [reopened.get(f"file{index}.js", 1, 1) for index in range(3)] == ["x", "x", "x"]
+    reopened.close()
+
+
+def test_locked_database_falls_back_to_disk(tmp_path, capsys):
+    project = tmp_path / "project"
+    project.mkdir()
+    for index in range(3):
+        (project / f"module{index}.js").write_text(f"export const value{index} = {index};\n")
+    cache = FileCache(str(tmp_path / "cache"))
+    cache.connection.close()
+    cache.connection = sqlite3.connect(cache.path, timeout=0)
+    holder = sqlite3.connect(cache.path)
+    holder.execute("BEGIN EXCLUSIVE")
+    try:
+        contents = scan_files(str(project), (".js",), cache=cache)
+    finally:
+        holder.rollback()
+        holder.close()
+        cache.close()
+    assert sorted(os.path.basename(path) for path in contents) == ["module0.js", "module1.js", "module2.js"]
+    assert capsys.readouterr().out.count("File cache unavailable") == 1
@@ -0,0 +1,39 @@
+from import_graph import ImportGraph, prune_unrelated
+from project_snapshot import ProjectSnapshot
+from search_index import rank_files
+
+
+def write_project(root):
+    (root / "src").mkdir()
+    (root / "src" / "api.js").write_text("export const fetchScales = () => fetch('/scales');\n")
+    (root / "src" / "ScaleCard.jsx").write_text("import { fetchScales } from './api';\nexport default function ScaleCard() {}\n")
+    (root / "src" / "App.jsx").write_text("import ScaleCard from './ScaleCard';\n")
+
+
+def test_prune_keeps_everything_without_anchors():
+    graph = ImportGraph({"a.js": ["b.js"], "b.js": [], "c.js": []})
+    assert prune_unrelated(["b.js", "c.js"], [], graph) == ["b.js", "c.js"]
+
+
+def test_prune_drops_unrelated_files():
+    graph = ImportGraph({"a.js": ["b.js"], "b.js": [], "c.js": []})
+    assert prune_unrelated(["b.js", "c.js"], ["a.js"], graph) == ["b.js"]
+
+
+def test_prune_never_drops_every_file():
+    graph = ImportGraph({"c.js": [], "d.js": []})
+    assert prune_unrelated(["c.js"], ["d.js"], graph) == ["c.js"]
+
+
+def test_import_cache_usable_after_rank_files(tmp_path, monkeypatch, capsys):
+    write_project(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    for _ in range(2):
+        with ProjectSnapshot("src", use_cache=True) as snapshot:
+            rank_files("scale card", snapshot, use_cache=True)
+            graph = ImportGraph.build(snapshot, use_cache=True)
+        assert "Import cache unavailable" not in capsys.readouterr().out
+        assert graph.dependencies_of("src/App.jsx") == ["src/ScaleCard.jsx", "src/api.js"]
+        # Edit a file so the second pass writes to the import cache again
+        with open("src/ScaleCard.jsx", "a") as f:
+            f.write("// edited\n")
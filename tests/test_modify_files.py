@@ -0,0 +1,64 @@
+import json
+
+from benchmarks.generators import generate_transform_pair
+from scripts.modify_files import CodeTransformer, block_ends, is_keep_marker, run_batch
+
+
+def test_block_ends_includes_body_when_brace_opens_on_next_line():
+    lines = ["function c()\n", "{\n", "  if (ready)\n", "  {\n", "    return 1;\n", "  }\n", "}\n"]
+    ends = block_ends(lines)
+    assert ends[0] == 7
+    assert ends[2] == 6
+
+
+def test_block_ends_one_line_block():
+    lines = ["if (x) { y(); }\n", "z();\n"]
+    assert block_ends(lines)[0] == 1
+
+
+def test_keep_markers_name_the_kept_code():
+    for line in ("// Rest of the component remains the same...", "{/* Existing JSX remains the same... */}",
+                 "// All other functions and JSX remain unchanged", "// this function should remain the same",
+                 "// ... existing code ..."):
+        assert is_keep_marker(line), line
+
+
+def test_ordinary_comments_are_not_keep_markers():
+    for line in ("// Modal remains open until the user saves", "// The list remains unchanged",
+                 "const a = 1; // existing code remains the same"):
+        assert not is_keep_marker(line), line
+
+
+def test_local_transform_matches_expected_output(tmp_path):
+    source_path, target_path, expected_path = generate_transform_pair(str(tmp_path), functions=60)
+    transformer = CodeTransformer(source_path, target_path, verbose=False)
+    output = transformer.execute_operations(json.dumps({"operations": transformer.generate_local_operations()}))
+    with open(expected_path) as f:
+        assert output == f.read()
+
+
+def test_marker_standing_for_no_source_lines_is_kept(tmp_path):
+    source_path = tmp_path / "source.txt"
+    target_path = tmp_path / "target.txt"
+    source_path.write_text("function a() {\n  return 1;\n}\n")
+    target_path.write_text("function a() {\n  return 1;\n}\n// rest of the code remains the same\n")
+    transformer = CodeTransformer(str(source_path), str(target_path), verbose=False)
+    output = transformer.execute_operations(json.dumps({"operations": transformer.generate_local_operations()}))
+    assert output == target_path.read_text()
+
+
+def test_batch_report_keeps_the_local_error(tmp_path):
+    (tmp_path / "source.txt").write_text("function a() {\n  return 1;\n}\n")
+    (tmp_path / "target.txt").write_text("function z() {\n  // this function should remain the same\n}\n")
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(json.dumps([{
+        "source": str(tmp_path / "source.txt"),
+        "target": str(tmp_path / "target.txt"),
+        "output": str(tmp_path / "output.txt"),
+    }]))
+    summary = run_batch(str(manifest), api_key=None, workers=1, state_path=str(tmp_path / "state.json"))
+    result = summary["results"][0]
+    assert result["status"] == "failed"
+    assert result["engine"] == "anthropic"
+    assert "target line 1" in result["error"]
+    assert "ANTHROPIC_API_KEY" in result["error"]
@@ -0,0 +1,34 @@
+from symbol_index import SymbolIndex
+
+
+def make_index():
+    return SymbolIndex.from_definitions({
+        "src/utils/thresholdUtils.js": [
+            {"name": "getThresholdColor", "line_number": 1, "type": "function"},
+            # Prose from comments is recorded as definitions too
+            {"name": "for", "line_number": 2, "type": "css_class"},
+            {"name": "based", "line_number": 3, "type": "css_class"},
+        ],
+        "src/components/ScaleModal.jsx": [
+            {"name": "ScaleModal", "line_number": 5, "type": "component"},
+            {"name": "import", "line_number": 1, "type": "css_class"},
+            {"name": "formatDate", "line_number": 9, "type": "function"},
+            {"name": "helpers", "line_number": 12, "type": "variable"},
+        ],
+    })
+
+
+def test_plain_words_do_not_match_definitions():
+    assert make_index().files_for_request("Add a date filter for the products list, based on the import date") == {}
+
+
+def test_identifier_shaped_words_match():
+    files = make_index().files_for_request("Make ScaleModal use getThresholdColor and formatDate")
+    assert files == {
+        "src/components/ScaleModal.jsx": ["ScaleModal", "formatDate"],
+        "src/utils/thresholdUtils.js": ["getThresholdColor"],
+    }
+
+
+def test_backticked_lowercase_names_match():
+    assert make_index().files_for_request("Move `helpers()` out") == {"src/components/ScaleModal.jsx": ["helpers"]}
@@ -0,0 +1,131 @@
+import os
+import re
+import base64
+import hashlib
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+
+BPE_FILE_ENV_VAR = "SCALEZ_BPE_FILE"
+
+# cl100k_base pre-tokenizer, used as-is when tiktoken is installed
+CL100K_PATTERN = r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?\p{L}+|\p{N}{1,3}| ?[^\s\p{L}\p{N}]+[\r\n]*|\s*[\r\n]+|\s+(?!\S)|\s+"""
+
+# The same pre-tokenizer written for the standard library `re` module, where
+# letters are [^\W\d_] and "neither letter nor number" is [^\w]|_
+FALLBACK_PATTERN = re.compile(
+    r"""'(?i:[sdmt]|ll|ve|re)|(?:[^\r\n\w]|_)?[^\W\d_]+|\d{1,3}| ?(?:[^\s\w]|_)+[\r\n]*|\s*[\r\n]+|\s+(?!\S)|\s+"""
+)
+
+
+class CharRatioTokenCounter:
+    """Estimates token counts from text length (1 token ≈ 4 characters for plain text)."""
+
+    def __init__(self, chars_per_token=4):
+        self.chars_per_token = chars_per_token
+
+    def count(self, text):
+        return len(text) // self.chars_per_token
+
+
+def load_bpe_ranks(bpe_file):
+    """Load a tiktoken-format BPE file: one base64-encoded token and its merge rank per line."""
+    ranks = {}
+    with open(bpe_file, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            token, rank = line.split()
+            ranks[base64.b64decode(token)] = int(rank)
+    return ranks
+
+
+class BPETokenCounter:
+    """
+    Counts tokens with a byte-pair encoding loaded from a local tiktoken-format file.
+
+    Uses tiktoken when it is installed, otherwise a pure-Python merge loop with the
+    same ranks, caching the token count of every pre-tokenized piece it has seen.
+    """
+
+    def __init__(self, bpe_file, pattern=CL100K_PATTERN):
+        self.bpe_file = bpe_file
+        self.ranks = load_bpe_ranks(bpe_file)
+        self._encoding = None
+        self._piece_counts = {}
+        if tiktoken is not None:
+            self._encoding = tiktoken.Encoding(
+                name=os.path.basename(bpe_file),
+                pat_str=pattern,
+                mergeable_ranks=self.ranks,
+                special_tokens={},
+            )
+
+    def count(self, text):
+        if self._encoding is not None:
+            return len(self._encoding.encode_ordinary(text))
+        return sum(self._count_piece(piece) for piece in FALLBACK_PATTERN.findall(text))
+
+    def _count_piece(self, piece):
+        count = self._piece_counts.get(piece)
+        if count is None:
+            count = self._merge_count(piece.encode("utf-8"))
+            self._piece_counts[piece] = count
+        return count
+
+    def _merge_count(self, piece):
+        if piece in self.ranks:
+            return 1
+        parts = [piece[i:i + 1] for i in range(len(piece))]
+        while len(parts) > 1:
+            # Merge the adjacent pair with the lowest rank, as tiktoken does
+            best_rank = None
+            best_index = None
+            for i in range(len(parts) - 1):
+                rank = self.ranks.get(parts[i] + parts[i + 1])
+                if rank is not None and (best_rank is None or rank < best_rank):
+                    best_rank = rank
+                    best_index = i
+            if best_index is None:
+                break
+            parts[best_index:best_index + 2] = [parts[best_index] + parts[best_index + 1]]
+        return len(parts)
+
+
+_token_counter = None
+_file_token_counts = {}
+
+
+def get_token_counter():
+    """Return the active token counter: a BPE from $SCALEZ_BPE_FILE if set, else the 4-chars heuristic."""
+    global _token_counter
+    if _token_counter is None:
+        bpe_file = os.environ.get(BPE_FILE_ENV_VAR)
+        _token_counter = BPETokenCounter(bpe_file) if bpe_file else CharRatioTokenCounter()
+    return _token_counter
+
+
+def set_token_counter(counter):
+    """Replace the active token counter. Any object with a `count(text)` method works."""
+    global _token_counter
+    _token_counter = counter
+    _file_token_counts.clear()
+
+
+def count_tokens(text):
+    """Count the tokens in a text with the active token counter."""
+    return get_token_counter().count(text)
+
+
+def count_file_tokens(file_path, text):
+    """Count the tokens of a file's text, memoized per file until its content changes."""
+    digest = hashlib.sha1(text.encode("utf-8")).digest()
+    cached = _file_token_counts.get(file_path)
+    if cached is not None and cached[0] == digest:
+        return cached[1]
+    count = count_tokens(text)
+    _file_token_counts[file_path] = (digest, count)
+    return count